@@ -0,0 +1,70 @@
+# NokoDabo/profiles.py
+"""
+Settings profiles, selected with the NOKODABO_ENV environment variable:
+
+    NOKODABO_ENV=production NOKODABO_SECRET_KEY=... \
+        NOKODABO_ALLOWED_HOSTS=bakery.lan,192.168.1.10 python start_server.py
+
+NokoDabo/settings.py calls apply_profile(globals()) at the very end, so a
+profile only overrides what it names. The default is the development setup.
+"""
+import os
+from django.core.exceptions import ImproperlyConfigured
+
+PRODUCTION = 'production'
+
+
+def apply_profile(settings):
+    settings['PROFILE'] = os.environ.get('NOKODABO_ENV', 'development')
+    if settings['PROFILE'] == PRODUCTION:
+        apply_production(settings)
+
+
+def required_env(name):
+    value = os.environ.get(name, '').strip()
+    if not value:
+        raise ImproperlyConfigured(f"The production profile needs the {name} environment variable.")
+    return value
+
+
+def apply_production(settings):
+    # refused by the bakery.E001 check; only here so a debugging session can say so
+    settings['DEBUG'] = os.environ.get('NOKODABO_DEBUG') == '1'
+    settings['SECRET_KEY'] = required_env('NOKODABO_SECRET_KEY')
+    # the names and LAN addresses the branches use to reach the server
+    settings['ALLOWED_HOSTS'] = [host.strip() for host in required_env('NOKODABO_ALLOWED_HOSTS').split(',')]
+
+    # keep each worker's connection (and its pragmas) between requests; WAL
+    # and the other SQLITE_PRAGMAS for every database without pragmas of
+    # its own (the reporting copy has)
+    for database in settings['DATABASES'].values():
+        database.setdefault('CONN_MAX_AGE', 600)
+        database.setdefault('CONN_HEALTH_CHECKS', True)
+        if database['ENGINE'] == 'django.db.backends.sqlite3':
+            database.setdefault('OPTIONS', {}).setdefault('init_command', '; '.join(settings['SQLITE_PRAGMAS']))
+
+    # shared by all server processes on the machine: catalog versions, unit
+    # costs and admin facets must be invalidated for every worker at once
+    settings['CACHES'] = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': settings['BASE_DIR'] / 'cache',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+    settings['SESSION_ENGINE'] = 'django.contrib.sessions.backends.cached_db'
+
+    templates = settings['TEMPLATES'][0]
+    templates['APP_DIRS'] = False
+    templates['OPTIONS']['loaders'] = [
+        ('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ]
+
+    middleware = list(settings['MIDDLEWARE'])
+    # after SecurityMiddleware, before anything else that reads the response body
+    middleware.insert(middleware.index('django.middleware.security.SecurityMiddleware') + 1,
+                      'django.middleware.gzip.GZipMiddleware')
+    settings['MIDDLEWARE'] = middleware
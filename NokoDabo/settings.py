@@ -76,13 +76,63 @@ WSGI_APPLICATION = 'NokoDabo.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# SQLite tuned for several branch users at once:
+# - WAL lets readers run while one connection writes; synchronous=NORMAL is
+#   durable across application crashes in WAL mode and skips most fsyncs.
+# - IMMEDIATE takes the write lock at BEGIN, so two writers queue on the busy
+#   timeout instead of failing when a read transaction tries to upgrade. It
+#   applies to every atomic block, read-only ones included: admin change
+#   pages (even GETs) run in one and take the write lock, so keep other read
+#   paths out of atomic() where they don't need it.
+# - timeout is the busy timeout in seconds; see bakery.db.retry_on_locked for
+#   what happens after it expires.
+# The production profile (NokoDabo.profiles) runs SQLITE_PRAGMAS on every new
+# connection. journal_mode=WAL is stored in the database file itself, so the
+# development profile leaves them out and the checked-in db.sqlite3 unchanged.
+SQLITE_PRAGMAS = [
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA mmap_size=134217728',   # 128 MB
+    'PRAGMA cache_size=-20000',     # ~20 MB page cache per connection
+]
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+        # a file rather than SQLite's in-memory default, so tests with
+        # concurrent writers can switch it to WAL and lock like the server
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
+    },
+    # Read-only copy for reports and exports, refreshed from 'default' with
+    # `python manage.py refresh_reporting_db [--interval SECONDS]`. Until the
+    # first refresh creates the file, reports read 'default'.
+    'reporting': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'reporting.sqlite3',
+        'OPTIONS': {
+            'init_command': 'PRAGMA query_only=ON; PRAGMA mmap_size=134217728',
+            'timeout': 20,
+        },
+        'TEST': {'MIRROR': 'default'},
+    },
 }
 
+# Optional per-branch databases for stock, inventory and branch finance
+# (branches.sharding), each with its own writer lock. Map branch ids to
+# aliases, add the aliases to DATABASES and run `manage.py init_branch_shards`:
+#   BRANCH_SHARDS = {1: 'branch_1', 2: 'branch_2'}
+#   DATABASES['branch_1'] = {**DATABASES['default'], 'NAME': BASE_DIR / 'branch_1.sqlite3'}
+# Branches not listed stay in 'default'. Empty: everything in 'default'.
+BRANCH_SHARDS = {}
+
+DATABASE_ROUTERS = ['branches.sharding.BranchShardRouter', 'bakery.db.ReportingRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -119,10 +169,28 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
 
 STATIC_URL = 'static/'
+# collectstatic target, served by start_server.py in production
+STATIC_ROOT = BASE_DIR / 'staticfiles'
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
-
+# Finance posting
+# False: revenue/expense rows are written inside the sale's own transaction.
+# True: the sale only queues a finance.FinanceOutbox row and a separate
+# `python manage.py finance_worker` process does the posting.
+FINANCE_OUTBOX = False
+
+# Stock movement group commit (stock/movements/)
+# True: concurrent movements are saved by one writer thread per process in
+# shared transactions of up to MAX_ITEMS movements or MAX_DELAY_MS of waiting,
+# so one COMMIT covers many sales. Each caller still gets its own result.
+STOCK_GROUP_COMMIT = False
+STOCK_GROUP_COMMIT_MAX_ITEMS = 100
+STOCK_GROUP_COMMIT_MAX_DELAY_MS = 5
+
+# Environment-selected profile (NOKODABO_ENV=production); keep this last
+from NokoDabo.profiles import apply_profile
+apply_profile(globals())
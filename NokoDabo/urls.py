@@ -23,6 +23,7 @@ urlpatterns = [
     path('accounts/', include('django.contrib.auth.urls')),  # adds login, logout, password change, etc.
     path('', bakery_views.home, name='home'),  # root URL
 path('bakery/', include('bakery.urls')),
+path('stock/', include('StockTransaction.urls')),
 
     
 ]
@@ -1,13 +1,57 @@
 from django.contrib import admin
+from django.core.exceptions import ValidationError
+from bakery.changelists import KeysetPaginationMixin
+from bakery.exports import CSVExportMixin
+from bakery.filters import BranchFilter
+from bakery.search import FullTextSearchMixin
+from branches.sharding import BranchShardAdminMixin
 from .forms import StockTransactionForm
 from .models import StockTransaction
 
 @admin.register(StockTransaction)
-class StockTransactionAdmin(admin.ModelAdmin):
+class StockTransactionAdmin(BranchShardAdminMixin, FullTextSearchMixin, KeysetPaginationMixin, CSVExportMixin, admin.ModelAdmin):
     form = StockTransactionForm
     list_display = ('branch', 'product_type', 'product_name', 'transaction_type', 'quantity', 'created_at')
-    list_filter = ('branch', 'product_type', 'transaction_type')
-    search_fields = ('product_name',)
+    list_select_related = ('branch',)
+    list_filter = (BranchFilter, 'product_type', 'transaction_type')
+    search_fields = ('product_name', 'branch__name')
+    csv_export_filename = "stock_transactions.csv"
+    csv_export_columns = (
+        ("Created At", "created_at"),
+        ("Branch", "branch__name"),
+        ("Product Type", "product_type"),
+        ("Product Name", "product_name"),
+        ("Transaction Type", "transaction_type"),
+        ("Quantity", "quantity"),
+    )
+
+    def get_queryset(self, request):
+        # the change page title is str(obj), which names the branch
+        return super().get_queryset(request).select_related('branch')
+
+    def changeform_view(self, request, object_id=None, form_url='', extra_context=None):
+        try:
+            return super().changeform_view(request, object_id, form_url, extra_context)
+        except ValidationError as error:
+            # save() refused a row the form let through (InsufficientStock
+            # when the stock went between the check and the save, as it can
+            # with branch databases): the transaction has rolled back, so
+            # show the form again with the error instead of a server error
+            request.stock_save_error = error
+            return super().changeform_view(request, object_id, form_url, extra_context)
+
+    def get_form(self, request, obj=None, **kwargs):
+        form = super().get_form(request, obj, **kwargs)
+        error = getattr(request, 'stock_save_error', None)
+        if error is None:
+            return form
+
+        class SaveErrorForm(form):
+            def clean(self):
+                cleaned_data = super().clean()
+                self.add_error(None, error)
+                return cleaned_data
+        return SaveErrorForm
 
     class Media:
         js = ("StockTransaction/js/stocktransaction.js",)
\ No newline at end of file
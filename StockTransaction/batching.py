@@ -0,0 +1,131 @@
+# StockTransaction/batching.py
+"""
+Group commit for stock movements (opt-in with settings.STOCK_GROUP_COMMIT).
+
+Concurrent requests hand their unsaved StockTransaction to one writer thread,
+which saves whatever has queued up (at most STOCK_GROUP_COMMIT_MAX_ITEMS, or
+whatever arrived within STOCK_GROUP_COMMIT_MAX_DELAY_MS) in a single database
+transaction. Each movement gets its own savepoint, so one failure (e.g.
+InsufficientStock) only fails that caller; every caller is answered after the
+shared COMMIT has returned, and the commit cost is paid once per group.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from finance.posting import posting_batch
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+class GroupCommitWriter:
+    def __init__(self, max_items=100, max_delay=0.005, using=DEFAULT_DB_ALIAS):
+        self.max_items = max_items
+        self.max_delay = max_delay
+        self.using = using
+        self.queue = queue.Queue()
+        self.thread = None
+
+    def start(self):
+        """Start the writer thread, or a fresh one if the last one died; queued items are kept."""
+        self.thread = threading.Thread(target=self.run, name="stock-group-commit", daemon=True)
+        self.thread.start()
+
+    def is_alive(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def submit(self, instance):
+        """Queue an unsaved StockTransaction; the Future resolves to it once committed."""
+        future = Future()
+        self.queue.put((instance, future))
+        return future
+
+    def run(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_items:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self.commit(batch)
+            except BaseException as exc:
+                # never leave a caller waiting on a thread that is gone
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+                raise
+
+    def commit(self, batch):
+        outcomes = []
+        try:
+            # finance rows of the whole group go out in one bulk_create as well
+            with posting_batch(self.using) as postings:
+                for instance, future in batch:
+                    # skip items whose caller gave up waiting (see save_stock_transaction)
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    try:
+                        with postings.savepoint():
+                            instance.save()
+                    except Exception as exc:
+                        outcomes.append((future, None, exc))
+                    else:
+                        outcomes.append((future, instance, None))
+        except Exception as exc:
+            # the COMMIT itself failed: nothing in the group was saved
+            connections[self.using].close_if_unusable_or_obsolete()
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        for future, instance, exc in outcomes:
+            if exc is None:
+                future.set_result(instance)
+            else:
+                future.set_exception(exc)
+
+
+def get_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = GroupCommitWriter(
+                max_items=getattr(settings, 'STOCK_GROUP_COMMIT_MAX_ITEMS', 100),
+                max_delay=getattr(settings, 'STOCK_GROUP_COMMIT_MAX_DELAY_MS', 5) / 1000,
+            )
+        if not _writer.is_alive():
+            _writer.start()
+        return _writer
+
+
+def save_stock_transaction(instance, timeout=30):
+    """
+    Save ``instance`` through the group-commit writer when enabled, otherwise
+    directly. Inside an atomic block it always saves directly: the caller's
+    open transaction would hold the write lock the writer thread needs.
+
+    If the writer has not started on the movement after ``timeout`` seconds,
+    it is withdrawn and TimeoutError raised: nothing was saved. Once its group
+    is being written, the outcome is awaited instead, so a caller is never
+    told it failed for a movement that then commits.
+    """
+    if not getattr(settings, 'STOCK_GROUP_COMMIT', False) or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+        instance.save()
+        return instance
+    future = get_writer().submit(instance)
+    try:
+        return future.result(timeout)
+    except TimeoutError:
+        if future.cancel():
+            raise
+    return future.result()
@@ -1,17 +1,9 @@
 from django import forms
 from .models import StockTransaction
-from branches.models import Branch
-from bakery.models import Bread, Injera, Flour, Yeast, Enhancer
+from bakery.forms import ProductFormMixin
+from bakery.models import PRODUCT_MODELS
 
-MODEL_MAP = {
-    'bread': Bread,
-    'injera': Injera,
-    'flour': Flour,
-    'yeast': Yeast,
-    'enhancer': Enhancer,
-}
-
-class StockTransactionForm(forms.ModelForm):
+class StockTransactionForm(ProductFormMixin, forms.ModelForm):
     product_choice = forms.ChoiceField(choices=[('', '---------')], required=True, label="Product Name")
 
     class Meta:
@@ -20,28 +12,14 @@ class StockTransactionForm(forms.ModelForm):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        
-        self.fields['branch'].queryset = Branch.objects.all()
-        self.fields['product_choice'].choices = [('', '---------')]
-
-        product_type = None
-        if self.data.get('product_type'):
-            product_type = self.data.get('product_type')
-        elif self.instance and getattr(self.instance, 'product_type', None):
-            product_type = self.instance.product_type
 
-        if product_type in MODEL_MAP:
-            Model = MODEL_MAP[product_type]
-            qs = Model.objects.all()
-            choices = [('', '---------')] + [(str(o.pk), o.name) for o in qs]
-            self.fields['product_choice'].choices = choices
-
-            if self.instance and getattr(self.instance, 'product_name', None):
-                try:
-                    selected_obj = Model.objects.get(name=self.instance.product_name)
-                    self.fields['product_choice'].initial = str(selected_obj.pk)
-                except Model.DoesNotExist:
-                    self.fields['product_choice'].initial = ''
+        product_type = self.setup_product_fields()
+        if product_type in PRODUCT_MODELS and self.instance and getattr(self.instance, 'product_name', None):
+            names = self.product_names(product_type)
+            selected = self.instance.product_id
+            if selected not in names:
+                selected = next((pk for pk, name in names.items() if name == self.instance.product_name), None)
+            self.fields['product_choice'].initial = str(selected) if selected else ''
 
     def clean_product_choice(self):
         val = self.cleaned_data.get('product_choice')
@@ -60,31 +38,27 @@ class StockTransactionForm(forms.ModelForm):
         transaction_type = cleaned_data.get("transaction_type")
 
         product_id = cleaned_data.get("product_choice")
-        Model = MODEL_MAP.get(product_type)
-        product_name = None
-        if Model and product_id:
-            try:
-                obj = Model.objects.get(pk=product_id)
-                product_name = obj.name
-            except Model.DoesNotExist:
-                pass
+        product_name = self.product_name(product_type, product_id) if product_id else None
 
-        if transaction_type == "out" and branch and product_type and product_name:
-            from bakery.models import Inventory
-            try:
-                inventory = Inventory.objects.get(
-                    branch=branch,
-                    product_type=product_type,
-                    product_name=product_name
-                )
-                if inventory.quantity < quantity:
-                    raise forms.ValidationError(
-                        f"❌ Not enough stock of {product_name} in {branch}. "
-                        f"Available: {inventory.quantity}, requested: {quantity}."
-                    )
-            except Inventory.DoesNotExist:
+        # Only a read here: the guarded decrement happens when the row is
+        # saved (StockTransaction.save), so a form that fails later on leaves
+        # inventory untouched. The read can be out of date by the time of the
+        # save (the admin's transaction is on 'default', not on the branch
+        # database), so callers still handle InsufficientStock from save():
+        # StockTransactionAdmin shows it as a form error.
+        if transaction_type == "out" and branch and product_type and product_name and quantity is not None:
+            self.instance.branch = branch
+            self.instance.product_type = product_type
+            self.instance.product_name = product_name
+            self.instance.product_id = product_id
+            self.instance.quantity = quantity
+            available = self.instance.available_stock()
+            if available is None:
+                raise forms.ValidationError(f"❌ No inventory record found for {product_name} in {branch}.")
+            if available < quantity:
                 raise forms.ValidationError(
-                    f"❌ No inventory record found for {product_name} in {branch}."
+                    f"❌ Not enough stock of {product_name} in {branch}. "
+                    f"Available: {available}, requested: {quantity}."
                 )
 
         return cleaned_data
@@ -92,15 +66,10 @@ class StockTransactionForm(forms.ModelForm):
     def save(self, commit=True):
         instance = super().save(commit=False)
         product_id = self.cleaned_data.get('product_choice')
-        Model = MODEL_MAP.get(instance.product_type)
-        if Model:
-            try:
-                obj = Model.objects.get(pk=product_id)
-                instance.product_name = obj.name
-                instance.product_id = obj.pk
-            except Model.DoesNotExist:
-                instance.product_name = ""
-                instance.product_id = None
+        if instance.product_type in PRODUCT_MODELS:
+            product_name = self.product_name(instance.product_type, product_id)
+            instance.product_name = product_name or ""
+            instance.product_id = product_id if product_name else None
         if commit:
             instance.save()
         return instance
\ No newline at end of file
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Value
+from django.db.models.functions import Cast, Concat
+
+
+def link_catalog_products(apps, schema_editor, model_label):
+    """Point each row at its registry entry ("<product_type>:<product_id>")."""
+    db = schema_editor.connection.alias
+    Model = apps.get_model(*model_label.split('.'))
+    Product = apps.get_model('bakery', 'Product')
+    Model.objects.using(db).filter(product_id__isnull=False).update(
+        catalog_product_id=Concat('product_type', Value(':'), Cast('product_id', models.CharField()))
+    )
+    Model.objects.using(db).exclude(
+        catalog_product_id__in=Product.objects.using(db).values('key')
+    ).update(catalog_product_id=None)
+
+
+def link_stock_transactions(apps, schema_editor):
+    link_catalog_products(apps, schema_editor, 'StockTransaction.StockTransaction')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('StockTransaction', '0003_alter_stocktransaction_quantity'),
+        ('bakery', '0016_product_registry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stocktransaction',
+            name='catalog_product',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, to='bakery.product', to_field='key'),
+        ),
+        migrations.RunPython(link_stock_transactions, migrations.RunPython.noop),
+    ]
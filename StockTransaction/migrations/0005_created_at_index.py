@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('StockTransaction', '0004_product_registry'),
+        ('bakery', '0016_product_registry'),
+        ('branches', '0004_alter_userbranch_branch'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stocktransaction',
+            index=models.Index(fields=['created_at', 'id'], name='stocktxn_created_id_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-18 13:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('StockTransaction', '0005_created_at_index'),
+        ('bakery', '0017_ledger_search'),
+        ('branches', '0004_alter_userbranch_branch'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stocktransaction',
+            index=models.Index(fields=['branch', 'product_type', 'product_id', 'created_at'], name='stocktxn_product_time_idx'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.6 on 2026-10-18 13:15
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+ledger_search = import_module('bakery.migrations.0017_ledger_search')
+TABLE = 'StockTransaction_stocktransaction'
+
+
+# SQLite adds a NOT NULL column by rebuilding the table, which it refuses to
+# rename while the full-text triggers point at it: drop the search index
+# around the change and build it again afterwards.
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in ledger_search.drop_sql(TABLE):
+            schema_editor.execute(sql)
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in ledger_search.index_sql(TABLE, ledger_search.INDEXES[TABLE]):
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('StockTransaction', '0006_product_time_index'),
+        ('bakery', '0019_inventory_checkpoint'),
+        ('branches', '0004_alter_userbranch_branch'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_search_index, create_search_index),
+        migrations.AddField(
+            model_name='stocktransaction',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='stocktransaction',
+            index=models.Index(fields=['updated_at'], name='stocktxn_updated_idx'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
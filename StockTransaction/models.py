@@ -1,5 +1,17 @@
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import models, router, transaction
+from django.db.models import Case, F, Value, When
+from bakery.db import retry_on_locked
 from branches.models import Branch  # centralized branch
+from branches.sharding import BranchShardQuerySet, shard_for, shards_enabled, use_shard
+
+# signed_quantity in SQL, for summing inventory deltas in the database
+SIGNED_QUANTITY = Case(
+    When(transaction_type='in', then=F('quantity')),
+    When(transaction_type='out', then=-F('quantity')),
+    default=Value(0.0),
+    output_field=models.FloatField(),
+)
 
 class StockTransaction(models.Model):
     TRANSACTION_TYPES = (
@@ -20,29 +32,143 @@ class StockTransaction(models.Model):
     )
     product_name = models.CharField(max_length=100)
     product_id = models.PositiveIntegerField(null=True, blank=True)
+    catalog_product = models.ForeignKey(
+        'bakery.Product', to_field='key', on_delete=models.SET_NULL, null=True, blank=True, editable=False
+    )
     quantity = models.FloatField()
     transaction_type = models.CharField(max_length=3, choices=TRANSACTION_TYPES)
     created_at = models.DateTimeField(auto_now_add=True)
+    # lets reconcile_inventory find rows edited since its last checkpoint
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = BranchShardQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # newest-first keyset pages in the admin
+            models.Index(fields=['created_at', 'id'], name='stocktxn_created_id_idx'),
+            # one product's movements in a time range (stock replay since a snapshot)
+            models.Index(
+                fields=['branch', 'product_type', 'product_id', 'created_at'],
+                name='stocktxn_product_time_idx',
+            ),
+            models.Index(fields=['updated_at'], name='stocktxn_updated_idx'),
+        ]
 
     def __str__(self):
         return f"{self.transaction_type} {self.quantity} {self.product_name} ({self.branch})"
 
+    @property
+    def signed_quantity(self):
+        """Quantity as an inventory delta: positive for stock-in, negative for stock-out."""
+        if self.transaction_type == "in":
+            return self.quantity
+        if self.transaction_type == "out":
+            return -self.quantity
+        return 0
+
+    def db_for_save(self, using=None):
+        """
+        Alias save() writes to. With per-branch databases it is always the
+        branch's: a ``using`` naming another database (such as the 'default'
+        that QuerySet.create() passes outside use_shard()) is overridden.
+        Otherwise ``using`` if given, else the router's choice.
+        """
+        if shards_enabled() and self.branch_id is not None:
+            return shard_for(self.branch_id)
+        return using or router.db_for_write(type(self), instance=self)
+
+    @retry_on_locked(using=lambda self, *args, **kwargs: self.db_for_save(kwargs.get('using')))
     def save(self, *args, **kwargs):
-        """Save transaction and update related inventory safely."""
-        super().save(*args, **kwargs)
+        """
+        Post the transaction as one unit of work.
 
-        from bakery.models import Inventory  # Inventory still in bakery
+        The ledger row, the inventory delta and the finance postings made by
+        the post_save handlers all share a single database transaction, so a
+        sale costs one commit and either fully lands or not at all.
 
-        inventory, created = Inventory.objects.get_or_create(
-            branch=self.branch,
-            product_type=self.product_type,
-            product_name=self.product_name,
-            defaults={'product_id': self.product_id or 0, 'quantity': 0}
-        )
+        Stock-outs go through ``Inventory.remove_stock`` first and raise
+        ``InsufficientStock`` (a ValidationError) if the branch cannot cover
+        them; forms only check ``available_stock()`` beforehand. A product
+        name missing from the catalog raises a ValidationError before
+        anything is written. Saving an edited row first takes its previously
+        saved movement back out of inventory, so only the difference is
+        applied.
 
-        if self.transaction_type == "in":
-            inventory.quantity += self.quantity
-        elif self.transaction_type == "out":
-            inventory.quantity -= self.quantity
+        With per-branch databases (branches.sharding) all of it happens in the
+        branch's database. If that database's write lock stays busy past the
+        timeout, the whole save is retried (bakery.db.retry_on_locked).
+        """
+        from bakery.models import Inventory, Product  # Inventory still in bakery
+
+        using = kwargs['using'] = self.db_for_save(kwargs.get('using'))
+        with use_shard(using), transaction.atomic(using=using):
+            if self.resolve_product_id() is None:
+                raise ValidationError(
+                    f"❌ Unknown {self.product_type} '{self.product_name}': add it to the product catalog first."
+                )
+            self.catalog_product_id = Product.key_for(self.product_type, self.product_id)
+            if not self._state.adding:
+                self.undo_previous()
+            if self.transaction_type == "out":
+                self.take_stock()
+                super().save(*args, **kwargs)
+            else:
+                super().save(*args, **kwargs)
+                Inventory.apply_delta(
+                    branch=self.branch,
+                    product_type=self.product_type,
+                    product_id=self.resolve_product_id(),
+                    delta=self.signed_quantity,
+                    product_name=self.product_name,
+                )
+
+    def undo_previous(self):
+        """Reverse the inventory delta of this row as it is currently saved."""
+        from bakery.models import Inventory
+
+        previous = type(self).objects.using(self._state.db).filter(pk=self.pk).select_related('branch').first()
+        if previous is not None and previous.product_id is not None and previous.signed_quantity:
+            Inventory.apply_delta(
+                branch=previous.branch,
+                product_type=previous.product_type,
+                product_id=previous.product_id,
+                delta=-previous.signed_quantity,
+            )
+
+    def available_stock(self):
+        """
+        Quantity a stock-out saved now could take (None without an inventory
+        row): the inventory row, plus what saving an edit gives back from the
+        row's saved version. Reads only; ``save()`` still has the last word.
+        """
+        from bakery.models import Inventory
+        using = shard_for(self.branch_id)
+        key = dict(branch_id=self.branch_id, product_type=self.product_type, product_id=self.resolve_product_id())
+        available = Inventory.objects.using(using).filter(**key).values_list('quantity', flat=True).first()
+        if available is None or self._state.adding:
+            return available
+        previous = type(self).objects.using(using).filter(pk=self.pk, **key).first()
+        if previous is not None:
+            available -= previous.signed_quantity
+        return available
+
+    def take_stock(self):
+        """Remove this stock-out's quantity from inventory or raise InsufficientStock."""
+        from bakery.models import Inventory
+
+        key = dict(branch=self.branch, product_type=self.product_type, product_id=self.resolve_product_id())
+        if not Inventory.remove_stock(quantity=self.quantity, **key):
+            raise Inventory.insufficient_stock_error(
+                quantity=self.quantity, product_name=self.product_name, **key
+            )
 
-        inventory.save()
\ No newline at end of file
+    def resolve_product_id(self):
+        """Return product_id, looking it up by name for callers that only set product_name."""
+        if self.product_id is None:
+            from bakery.models import Product
+            self.product_id = (
+                Product.objects.filter(product_type=self.product_type, name=self.product_name)
+                .values_list('object_id', flat=True).first()
+            )
+        return self.product_id
@@ -0,0 +1,330 @@
+import threading
+from concurrent.futures import Future
+from decimal import Decimal
+from unittest import mock
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from bakery.filters import facet_values
+from bakery.models import Bread, InsufficientStock, Inventory
+from bakery.search import search_rows
+from bakery.tests import AdminQueryBudgetMixin, url_for
+from branches.models import Branch
+from finance.models import Transaction
+from . import batching
+from .forms import StockTransactionForm
+from .models import StockTransaction
+
+
+# a branch database for the sharding tests (branches.sharding); registered
+# before the test runner creates the test databases
+SHARD = 'test_branch_shard'
+_default = connections.databases[DEFAULT_DB_ALIAS]
+connections.databases.setdefault(SHARD, {
+    **_default,
+    'NAME': settings.BASE_DIR / f'{SHARD}.sqlite3',
+    'TEST': {**_default['TEST'], 'NAME': settings.BASE_DIR / f'test_{SHARD}.sqlite3'},
+})
+
+
+def make_bread(**fields):
+    values = dict(
+        name="White Bread", flour_kg=0.1, yeast_kg=0.01, enhancer_kg=0.0,
+        water_birr=Decimal('0.50'), electricity_birr=Decimal('0.50'), selling_price=Decimal('5.00'),
+    )
+    values.update(fields)
+    return Bread.objects.create(**values)
+
+
+class ConcurrentStockOutTests(TransactionTestCase):
+    """
+    Sales racing for the last units of a product, each from its own thread
+    and connection (the test database is a file, see settings.DATABASES),
+    in WAL mode like the production server's.
+    """
+    SALES = 40
+    STOCK = 15
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+            # stored in the file: every connection the threads open uses it too
+            cursor.execute('PRAGMA journal_mode=WAL')
+
+    def setUp(self):
+        self.branch = Branch.objects.create(name="Piassa", city="Addis Ababa")
+        self.bread = make_bread()
+        Inventory.objects.create(
+            branch=self.branch, product_type='bread', product_id=self.bread.pk,
+            product_name=self.bread.name, quantity=self.STOCK,
+        )
+
+    def post_concurrently(self, transaction_types):
+        """Save one 1-unit movement per entry, all threads starting together; returns their outcomes."""
+        outcomes = []
+        lock = threading.Lock()
+        start = threading.Barrier(len(transaction_types))
+
+        def post(transaction_type):
+            try:
+                start.wait()
+                StockTransaction(
+                    branch=self.branch, product_type='bread', product_id=self.bread.pk,
+                    product_name=self.bread.name, quantity=1, transaction_type=transaction_type,
+                ).save()
+                outcome = 'saved'
+            except InsufficientStock:
+                outcome = 'refused'
+            except Exception as exc:
+                outcome = exc
+            finally:
+                connections.close_all()
+            with lock:
+                outcomes.append(outcome)
+
+        threads = [threading.Thread(target=post, args=(kind,)) for kind in transaction_types]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return outcomes
+
+    def stock(self):
+        return Inventory.objects.get(branch=self.branch, product_type='bread', product_id=self.bread.pk).quantity
+
+    def test_exactly_the_available_units_are_sold(self):
+        outcomes = self.post_concurrently(['out'] * self.SALES)
+
+        self.assertEqual([outcome for outcome in outcomes if isinstance(outcome, Exception)], [])
+        self.assertEqual(outcomes.count('saved'), self.STOCK)
+        self.assertEqual(outcomes.count('refused'), self.SALES - self.STOCK)
+        self.assertEqual(self.stock(), 0)
+        # every sale that went through has its ledger and finance rows
+        self.assertEqual(StockTransaction.objects.filter(transaction_type='out').count(), self.STOCK)
+        self.assertEqual(Transaction.objects.filter(transaction_type='revenue').count(), self.STOCK)
+
+    def test_concurrent_deliveries_and_sales_lose_no_updates(self):
+        Inventory.objects.filter(product_id=self.bread.pk).update(quantity=self.SALES)
+        outcomes = self.post_concurrently(['in', 'out'] * (self.SALES // 2))
+
+        self.assertEqual(outcomes, ['saved'] * self.SALES)
+        self.assertEqual(self.stock(), self.SALES)
+
+
+class StockTransactionFormTests(TestCase):
+    def setUp(self):
+        self.branch = Branch.objects.create(name="Piassa", city="Addis Ababa")
+        self.bread = make_bread()
+        Inventory.objects.create(
+            branch=self.branch, product_type='bread', product_id=self.bread.pk,
+            product_name=self.bread.name, quantity=10,
+        )
+
+    def form(self, quantity, instance=None):
+        return StockTransactionForm(data={
+            'branch': self.branch.pk, 'product_type': 'bread', 'product_choice': str(self.bread.pk),
+            'quantity': quantity, 'transaction_type': 'out',
+        }, instance=instance)
+
+    def stock(self):
+        return Inventory.objects.get(product_id=self.bread.pk).quantity
+
+    def test_validation_leaves_inventory_alone(self):
+        form = self.form(4)
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(self.stock(), 10)
+        form.save()
+        self.assertEqual(self.stock(), 6)
+
+    def test_insufficient_stock_is_a_form_error(self):
+        form = self.form(11)
+        self.assertFalse(form.is_valid())
+        self.assertIn("Not enough stock", str(form.errors))
+        self.assertEqual(self.stock(), 10)
+
+    def test_edit_counts_its_own_saved_quantity(self):
+        sale = self.form(8).save()
+        self.assertEqual(self.stock(), 2)
+        form = self.form(9, instance=sale)
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(self.stock(), 2)
+        form.save()
+        self.assertEqual(self.stock(), 1)
+        self.assertFalse(self.form(11, instance=sale).is_valid())
+
+    def test_unknown_products_are_rejected_before_writing(self):
+        delivery = StockTransaction(
+            branch=self.branch, product_type='flour', product_name="Unknown Flour", quantity=5, transaction_type='in',
+        )
+        with self.assertRaisesMessage(ValidationError, "Unknown flour 'Unknown Flour'"):
+            delivery.save()
+        self.assertFalse(StockTransaction.objects.exists())
+        self.assertEqual(Inventory.objects.count(), 1)
+
+
+class GroupCommitWriterTests(TestCase):
+    def setUp(self):
+        self.branch = Branch.objects.create(name="Piassa", city="Addis Ababa")
+        self.bread = make_bread()
+        Inventory.objects.create(
+            branch=self.branch, product_type='bread', product_id=self.bread.pk,
+            product_name=self.bread.name, quantity=10,
+        )
+
+    def sale(self):
+        return StockTransaction(
+            branch=self.branch, product_type='bread', product_id=self.bread.pk,
+            product_name=self.bread.name, quantity=1, transaction_type='out',
+        )
+
+    def test_withdrawn_items_are_not_written(self):
+        kept, withdrawn = (self.sale(), Future()), (self.sale(), Future())
+        withdrawn[1].cancel()
+        batching.GroupCommitWriter().commit([withdrawn, kept])
+
+        self.assertIs(kept[1].result(), kept[0])
+        self.assertIsNone(withdrawn[0].pk)
+        self.assertEqual(StockTransaction.objects.count(), 1)
+        self.assertEqual(Inventory.objects.get().quantity, 9)
+
+    def test_a_dead_writer_thread_is_replaced(self):
+        writer = batching.GroupCommitWriter()
+        writer.thread = threading.Thread(target=lambda: None)
+        writer.thread.start()
+        writer.thread.join()
+        with mock.patch.object(batching, '_writer', writer), mock.patch.object(writer, 'run') as run:
+            self.assertIs(batching.get_writer(), writer)
+            writer.thread.join()
+        run.assert_called_once_with()
+
+
+class ShardedBranchMixin:
+    """A 'Piassa' branch in 'default' and a 'Bole' branch in the SHARD database."""
+    databases = {DEFAULT_DB_ALIAS, SHARD}
+
+    def setUp(self):
+        self.home = Branch.objects.create(name="Piassa", city="Addis Ababa")
+        self.sharded = Branch.objects.create(name="Bole", city="Addis Ababa")
+        shards = override_settings(BRANCH_SHARDS={self.sharded.pk: SHARD})
+        shards.enable()
+        self.addCleanup(shards.disable)
+        # created before the override, so copy them like init_branch_shards does
+        for row in (self.home, self.sharded):
+            Branch.objects.using(SHARD).create(**{f.attname: getattr(row, f.attname) for f in Branch._meta.concrete_fields})
+        self.bread = make_bread()
+
+    def key(self, branch):
+        return dict(branch=branch, product_type='bread', product_id=self.bread.pk, product_name=self.bread.name)
+
+
+class BranchShardRoutingTests(ShardedBranchMixin, TestCase):
+    def test_manager_writes_go_to_the_branch_database(self):
+        Inventory.objects.create(**self.key(self.sharded), quantity=10)
+        StockTransaction.objects.create(**self.key(self.sharded), quantity=4, transaction_type='out')
+        inventory, created = Inventory.objects.get_or_create(**self.key(self.sharded))
+
+        self.assertFalse(created)
+        self.assertEqual(inventory._state.db, SHARD)
+        self.assertEqual(inventory.quantity, 6)
+        self.assertEqual(StockTransaction.objects.using(SHARD).count(), 1)
+        self.assertFalse(Inventory.objects.using(DEFAULT_DB_ALIAS).exists())
+        self.assertFalse(StockTransaction.objects.using(DEFAULT_DB_ALIAS).exists())
+
+    def test_bulk_create_splits_rows_by_branch_database(self):
+        Inventory.objects.bulk_create([
+            Inventory(**self.key(self.home), quantity=1),
+            Inventory(**self.key(self.sharded), quantity=2),
+        ])
+        self.assertEqual(list(Inventory.objects.using(DEFAULT_DB_ALIAS).values_list('quantity', flat=True)), [1])
+        self.assertEqual(list(Inventory.objects.using(SHARD).values_list('quantity', flat=True)), [2])
+
+    def test_save_overrides_an_alias_of_another_database(self):
+        Inventory.objects.create(**self.key(self.sharded), quantity=10)
+        sale = StockTransaction(**self.key(self.sharded), quantity=1, transaction_type='out')
+        sale.save(using=DEFAULT_DB_ALIAS)
+
+        self.assertEqual(sale._state.db, SHARD)
+        self.assertTrue(StockTransaction.objects.using(SHARD).filter(pk=sale.pk).exists())
+        self.assertFalse(StockTransaction.objects.using(DEFAULT_DB_ALIAS).exists())
+
+
+class ShardedSearchTests(ShardedBranchMixin, TransactionTestCase):
+    """search_rows() reads every branch database from its own threads, so the rows must be committed."""
+
+    def test_search_covers_every_branch_database(self):
+        for branch in (self.home, self.sharded):
+            Inventory.objects.create(**self.key(branch), quantity=10)
+            StockTransaction.objects.create(**self.key(branch), quantity=1, transaction_type='in')
+
+        rows = search_rows(StockTransaction, "white")
+        self.assertEqual(
+            sorted((row['database'], row['branch']) for row in rows),
+            [(DEFAULT_DB_ALIAS, "Piassa (Addis Ababa)"), (SHARD, "Bole (Addis Ababa)")],
+        )
+        self.assertEqual(len(search_rows(StockTransaction, "white", limit=1)), 1)
+
+
+class ShardedFacetTests(ShardedBranchMixin, TransactionTestCase):
+    def test_facets_cover_every_branch_database(self):
+        cache.clear()
+        for branch, name in ((self.home, "White Bread"), (self.sharded, "Brown Bread")):
+            StockTransaction.objects.bulk_create([
+                StockTransaction(**{**self.key(branch), 'product_name': name}, quantity=1, transaction_type='in'),
+            ])
+        self.assertEqual(facet_values(StockTransaction, 'product_name'), ["Brown Bread", "White Bread"])
+
+
+class StockTransactionAdminQueryTests(AdminQueryBudgetMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.bread = make_bread()
+        Inventory.objects.create(
+            branch=self.branch, product_type='bread', product_id=self.bread.pk,
+            product_name=self.bread.name, quantity=10,
+        )
+
+    def add_rows(self, count):
+        StockTransaction.objects.bulk_create(
+            StockTransaction(branch=self.branch, product_type='bread', product_id=self.bread.pk,
+                             product_name=self.bread.name, quantity=1, transaction_type='in')
+            for _ in range(StockTransaction.objects.count(), count)
+        )
+
+    def test_changelist(self):
+        self.assertPageBudget(url_for(StockTransaction, 'changelist'), 3)
+
+    def test_add_form(self):
+        self.assertPageBudget(url_for(StockTransaction, 'add'), 2, branch_queries=0)
+
+    def test_change_form(self):
+        self.assertPageBudget(
+            lambda: url_for(StockTransaction, 'change', StockTransaction.objects.last().pk), 4, branch_queries=0,
+        )
+
+
+class StockTransactionAdminTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser("clerk", "clerk@example.com", "clerk"))
+        self.branch = Branch.objects.create(name="Piassa", city="Addis Ababa")
+        self.bread = make_bread()
+        Inventory.objects.create(
+            branch=self.branch, product_type='bread', product_id=self.bread.pk,
+            product_name=self.bread.name, quantity=3,
+        )
+
+    def test_stock_gone_by_the_save_is_a_form_error(self):
+        # the form's read finds enough stock, the save does not
+        with mock.patch.object(StockTransaction, 'available_stock', return_value=10):
+            response = self.client.post(url_for(StockTransaction, 'add'), {
+                'branch': self.branch.pk, 'product_type': 'bread', 'product_choice': str(self.bread.pk),
+                'quantity': 5, 'transaction_type': 'out',
+            })
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Not enough stock of White Bread")
+        self.assertFalse(StockTransaction.objects.exists())
+        self.assertEqual(Inventory.objects.get().quantity, 3)
@@ -0,0 +1,7 @@
+# StockTransaction/urls.py
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path("movements/", views.record_movement, name="record_movement"),
+]
@@ -0,0 +1,26 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.exceptions import ValidationError
+from django.http import JsonResponse
+from django.views.decorators.http import require_POST
+from .batching import save_stock_transaction
+from .forms import StockTransactionForm
+
+
+@require_POST
+@staff_member_required
+def record_movement(request):
+    """
+    Record one stock movement from a point of sale. Takes the fields of
+    StockTransactionForm; saved through group commit when it is enabled.
+    """
+    form = StockTransactionForm(request.POST)
+    if not form.is_valid():
+        return JsonResponse({"errors": form.errors}, status=400)
+    try:
+        stock = save_stock_transaction(form.save(commit=False))
+    except ValidationError as e:
+        return JsonResponse({"errors": {"__all__": e.messages}}, status=400)
+    return JsonResponse(
+        {"id": stock.pk, "product_name": stock.product_name, "quantity": stock.quantity},
+        status=201,
+    )
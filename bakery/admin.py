@@ -1,9 +1,13 @@
 from django.contrib import admin
+from .exports import CSVExportMixin
+from .filters import BranchFilter, ProductNameFilter
+from .search import FullTextSearchMixin
 from .forms import InventoryForm
 from django.contrib.auth.admin import UserAdmin as DefaultUserAdmin, GroupAdmin as DefaultGroupAdmin
 from django.contrib.auth.models import User, Group
-from .models import Bread, Injera, Flour, Yeast, Enhancer, Inventory
+from .models import Bread, Injera, Flour, Yeast, Enhancer, Inventory, InventorySnapshot, Product
 from branches.models import Branch, UserBranch
+from branches.sharding import BranchShardAdminMixin
 
 # ------------------- Bakery Products Admin -------------------
 @admin.register(Bread)
@@ -36,9 +40,27 @@ class EnhancerAdmin(admin.ModelAdmin):
     search_fields = ("name", "brand")
 
 
+# ------------------- Product Registry Admin -------------------
+@admin.register(Product)
+class ProductAdmin(admin.ModelAdmin):
+    """Read-only view of the registry; rows follow the product tables above."""
+    list_display = ("name", "product_type", "price")
+    list_filter = ("product_type",)
+    search_fields = ("name",)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
 # ------------------- Inventory Admin -------------------
 @admin.register(Inventory)
-class InventoryAdmin(admin.ModelAdmin):
+class InventoryAdmin(BranchShardAdminMixin, FullTextSearchMixin, CSVExportMixin, admin.ModelAdmin):
     form = InventoryForm
 
     def quantity_with_unit(self, obj):
@@ -51,14 +73,43 @@ class InventoryAdmin(admin.ModelAdmin):
 
     quantity_with_unit.short_description = "Quantity"
 
+    def get_queryset(self, request):
+        # the change page title is str(obj), which names the branch
+        return super().get_queryset(request).select_related('branch')
+
     list_display = ('branch', 'product_type', 'product_name', 'quantity_with_unit', 'last_updated')
-    list_filter = ('branch', 'product_type', 'product_name')
-    search_fields = ('product_name',)
+    list_select_related = ('branch',)
+    list_filter = (BranchFilter, 'product_type', ProductNameFilter)
+    search_fields = ('product_name', 'branch__name')
+    csv_export_filename = "inventory.csv"
+    csv_export_columns = (
+        ("Branch", "branch__name"),
+        ("Product Type", "product_type"),
+        ("Product Name", "product_name"),
+        ("Quantity", "quantity"),
+        ("Last Updated", "last_updated"),
+    )
 
     class Media:
         js = ('bakery/js/inventory.js',)
 
 
+# ------------------- Inventory Snapshot Admin -------------------
+@admin.register(InventorySnapshot)
+class InventorySnapshotAdmin(BranchShardAdminMixin, admin.ModelAdmin):
+    """Read-only; snapshots are written by `manage.py snapshot_inventory`."""
+    list_display = ('created_at', 'branch', 'product_type', 'product_name', 'quantity')
+    list_select_related = ('branch',)
+    list_filter = (BranchFilter, 'product_type', 'created_at')
+    date_hierarchy = 'created_at'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 # ------------------- Superuser Only Admin Mixin -------------------
 class SuperuserOnlyAdminMixin:
     def has_module_permission(self, request):
@@ -101,6 +152,7 @@ class CustomUserAdmin(SuperuserOnlyAdminMixin, DefaultUserAdmin):
 
     # Show branch column in list_display
     list_display = DefaultUserAdmin.list_display + ("branch",)
+    list_select_related = ("branch_assignment__branch",)
 
     # Preserve all default filters and add branch filter
     list_filter = DefaultUserAdmin.list_filter + ("branch_assignment__branch",)
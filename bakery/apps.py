@@ -3,3 +3,8 @@ from django.apps import AppConfig
 class BakeryConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'bakery'
+
+    def ready(self):
+        # import signals so catalog caches are invalidated on product changes
+        import bakery.signals  # noqa
+        import bakery.checks  # noqa
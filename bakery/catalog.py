@@ -0,0 +1,54 @@
+# bakery/catalog.py
+"""
+Cached product catalog for the admin product pickers.
+
+The catalog (id and name of every Bread, Injera, Flour, Yeast and Enhancer,
+read from the Product registry in one query) is cached under a version that
+changes whenever one of those models is saved or deleted (see
+bakery.signals). The version doubles as the ETag, so a client revalidating
+an unchanged catalog gets a 304 without any database query.
+"""
+import uuid
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .models import PRODUCT_MODELS, Product
+
+VERSION_KEY = 'bakery:catalog:version'
+
+
+def catalog_version():
+    """Return {'version': str, 'modified': datetime} for the current catalog."""
+    state = cache.get(VERSION_KEY)
+    if state is None:
+        state = {'version': uuid.uuid4().hex, 'modified': timezone.now().replace(microsecond=0)}
+        # add() keeps the first writer's version if several workers race here
+        if not cache.add(VERSION_KEY, state, None):
+            state = cache.get(VERSION_KEY, state)
+    return state
+
+
+def get_catalog():
+    """All products as {product_type: [{'id': pk, 'name': name}, ...]}."""
+    key = f"bakery:catalog:{catalog_version()['version']}"
+    catalog = cache.get(key)
+    if catalog is None:
+        catalog = {product_type: [] for product_type in PRODUCT_MODELS}
+        rows = Product.objects.order_by('name', 'object_id').values_list('product_type', 'object_id', 'name')
+        for product_type, object_id, name in rows:
+            catalog[product_type].append({'id': object_id, 'name': name})
+        cache.set(key, catalog, None)
+    return catalog
+
+
+def bump_catalog_version():
+    """Start a new catalog version; old cached payloads simply stop being read."""
+    def bump():
+        cache.set(VERSION_KEY, {
+            'version': uuid.uuid4().hex,
+            'modified': timezone.now().replace(microsecond=0),
+        }, None)
+    bump()
+    # again after commit, so nobody caches pre-commit rows under the new version
+    transaction.on_commit(bump)
@@ -0,0 +1,122 @@
+# bakery/changelists.py
+"""Keyset pagination and cached counts for large admin changelists."""
+import hashlib
+from datetime import datetime
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ALL_VAR, ORDER_VAR, ChangeList
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+AFTER_VAR = "after"
+BEFORE_VAR = "before"
+COUNT_CACHE_TIMEOUT = 60  # seconds a changelist total may lag behind the table
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator whose COUNT(*) is cached per query for COUNT_CACHE_TIMEOUT seconds."""
+
+    @cached_property
+    def count(self):
+        sql, params = self.object_list.query.sql_with_params()
+        key = "admin:count:" + hashlib.md5(repr((sql, params)).encode()).hexdigest()
+        return cache.get_or_set(key, self.object_list.count, COUNT_CACHE_TIMEOUT)
+
+
+def format_cursor(obj, field):
+    return f"{getattr(obj, field).isoformat()},{obj.pk}"
+
+
+def parse_cursor(value):
+    """(datetime, pk) from a cursor made by format_cursor(), or None."""
+    if not value:
+        return None
+    stamp, _, pk = value.rpartition(",")
+    try:
+        return datetime.fromisoformat(stamp), int(pk)
+    except ValueError:
+        raise IncorrectLookupParameters
+
+
+class KeysetChangeList(ChangeList):
+    """
+    ChangeList that pages by (cursor_field, id) while the default ordering is
+    in use: ?after=<cursor> continues below the last row shown and
+    ?before=<cursor> goes back, so every page costs the same index seek.
+    Sorting by a column or "Show all" falls back to the usual OFFSET pages.
+    """
+    cursor_field = "created_at"
+
+    def __init__(self, request, *args, **kwargs):
+        self.after = parse_cursor(request.GET.get(AFTER_VAR))
+        self.before = parse_cursor(request.GET.get(BEFORE_VAR))
+        self.keyset = False
+        self.first_url = self.previous_url = self.next_url = None
+        super().__init__(request, *args, **kwargs)
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(AFTER_VAR, None)
+        lookup_params.pop(BEFORE_VAR, None)
+        return lookup_params
+
+    def get_query_string(self, new_params=None, remove=None):
+        # filter, search and sort links start again from the first page
+        remove = [*(remove or ()), AFTER_VAR, BEFORE_VAR]
+        return super().get_query_string(new_params, remove)
+
+    def get_results(self, request):
+        if ORDER_VAR in self.params or self.show_all:
+            return super().get_results(request)
+
+        field, per_page = self.cursor_field, self.list_per_page
+        queryset = self.queryset
+        if self.before:
+            stamp, pk = self.before
+            rows = list(
+                queryset.filter(Q(**{f"{field}__gte": stamp}) & ~Q(**{field: stamp, "pk__lte": pk}))
+                .order_by(field, "pk")[:per_page + 1]
+            )
+            has_previous, has_next = len(rows) > per_page, True
+            rows = rows[:per_page][::-1]
+        else:
+            if self.after:
+                stamp, pk = self.after
+                queryset = queryset.filter(Q(**{f"{field}__lte": stamp}) & ~Q(**{field: stamp, "pk__gte": pk}))
+            rows = list(queryset.order_by(f"-{field}", "-pk")[:per_page + 1])
+            has_previous, has_next = self.after is not None, len(rows) > per_page
+            rows = rows[:per_page]
+
+        paginator = self.model_admin.get_paginator(request, self.queryset, per_page)
+        self.keyset = True
+        self.result_count = paginator.count
+        self.show_full_result_count = False
+        self.full_result_count = None
+        self.show_admin_actions = True
+        self.result_list = rows
+        self.can_show_all = self.result_count <= self.list_max_show_all
+        self.multi_page = has_previous or has_next
+        self.paginator = paginator
+        self.show_all_url = self.get_query_string({ALL_VAR: ""})
+        if has_previous:
+            self.first_url = self.get_query_string()
+        if rows and has_previous:
+            self.previous_url = self.get_query_string({BEFORE_VAR: format_cursor(rows[0], field)})
+        if rows and has_next:
+            self.next_url = self.get_query_string({AFTER_VAR: format_cursor(rows[-1], field)})
+
+
+class KeysetPaginationMixin:
+    """
+    Admin mixin for append-mostly ledgers: newest first, keyset pages and a
+    cached total instead of two exact COUNT(*) queries per page. The result
+    list is a plain list on keyset pages, so don't combine with list_editable.
+    """
+    change_list_template = "admin/keyset_change_list.html"
+    ordering = ("-created_at", "-id")
+    paginator = CachedCountPaginator
+    show_full_result_count = False
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
@@ -0,0 +1,15 @@
+# bakery/checks.py
+from django.conf import settings
+from django.core.checks import Error, register
+
+
+@register()
+def production_profile_check(app_configs, **kwargs):
+    """The production profile never runs with DEBUG on (it keeps every SQL query in memory)."""
+    if getattr(settings, 'PROFILE', None) == 'production' and settings.DEBUG:
+        return [Error(
+            "DEBUG is on in the production profile.",
+            hint="Unset NOKODABO_DEBUG, or run without NOKODABO_ENV=production.",
+            id='bakery.E001',
+        )]
+    return []
@@ -0,0 +1,98 @@
+# bakery/db.py
+"""
+Database helpers: bounded retry for SQLite write transactions that still hit
+a lock, and routing of report reads to the ``reporting`` copy.
+"""
+import functools
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from django.db import OperationalError, connections, DEFAULT_DB_ALIAS
+
+LOCKED_MESSAGES = ("database is locked", "database table is locked", "database is busy")
+
+
+def is_locked_error(exc):
+    return isinstance(exc, OperationalError) and any(msg in str(exc) for msg in LOCKED_MESSAGES)
+
+
+def retry_on_locked(func=None, *, attempts=5, delay=0.1, using=DEFAULT_DB_ALIAS):
+    """
+    Retry ``func`` when SQLite gives up waiting for the write lock.
+
+    The busy timeout (DATABASES OPTIONS 'timeout') already waits for the
+    lock; this only covers the rare writer that waits longer than that. Each
+    retry sleeps delay, 2*delay, 4*delay, ... plus jitter. Wrap a whole
+    transaction (the function that opens atomic()), never a statement inside
+    one: inside an atomic block on ``using`` the error is raised unchanged.
+
+    ``using`` is the alias the transaction writes to, or a function called
+    with the wrapped function's arguments that returns it (for code whose
+    database depends on the branch, see branches.sharding).
+    """
+    if func is None:
+        return functools.partial(retry_on_locked, attempts=attempts, delay=delay, using=using)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        alias = using(*args, **kwargs) if callable(using) else using
+        for attempt in range(attempts):
+            try:
+                return func(*args, **kwargs)
+            except OperationalError as exc:
+                last = attempt == attempts - 1
+                if last or not is_locked_error(exc) or connections[alias].in_atomic_block:
+                    raise
+                time.sleep(delay * 2 ** attempt * (1 + random.random()))
+    return wrapper
+
+
+# ------------------- Reporting copy -------------------
+REPORTING_ALIAS = 'reporting'
+# only ledger and catalog reads move; auth, sessions etc. always read the primary
+REPORTING_APPS = {'bakery', 'branches', 'finance', 'StockTransaction'}
+
+_reporting = threading.local()
+
+
+def reporting_alias():
+    """The reporting alias once a refresh has filled its file, else None."""
+    database = connections.databases.get(REPORTING_ALIAS)
+    # merely opening the alias leaves an empty file behind; that doesn't count
+    if database and os.path.isfile(database['NAME']) and os.path.getsize(database['NAME']):
+        return REPORTING_ALIAS
+    return None
+
+
+@contextmanager
+def reporting_reads():
+    """
+    Route reads made by this thread inside the block to the reporting copy
+    (see ReportingRouter). Usable as a decorator too. Data there is as old as
+    the last ``refresh_reporting_db``; writes still go to the primary.
+    """
+    _reporting.depth = getattr(_reporting, 'depth', 0) + 1
+    try:
+        yield
+    finally:
+        _reporting.depth -= 1
+
+
+class ReportingRouter:
+    """Sends reads inside reporting_reads() to the reporting copy, if it exists."""
+
+    def db_for_read(self, model, **hints):
+        if getattr(_reporting, 'depth', 0) and model._meta.app_label in REPORTING_APPS:
+            return reporting_alias()
+        return None
+
+    def db_for_write(self, model, **hints):
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # the copy takes its schema from the primary with each refresh
+        if db == REPORTING_ALIAS:
+            return False
+        return None
@@ -0,0 +1,107 @@
+# bakery/filters.py
+"""
+Admin sidebar filters read from the cache instead of running a SELECT
+DISTINCT over the whole table on every changelist load.
+
+Product names are seeded once per catalog version with one DISTINCT query
+per branch database (branches.sharding) and then extended as rows are
+posted (add_facet_values); a catalog change starts a new version, so
+renamed products show up after the next load. Branch choices are cached
+until a Branch is saved or deleted (see bakery.signals).
+"""
+from django.contrib import admin
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+
+from branches.models import Branch
+from branches.sharding import fan_out
+from .catalog import catalog_version
+from .models import PRODUCT_CHOICES
+
+FACET_TIMEOUT = 60 * 60  # reseed at least hourly so deleted rows drop out
+BRANCH_CHOICES_KEY = 'bakery:facets:branches'
+
+
+def facet_key(model, field):
+    return f"bakery:facets:{model._meta.label_lower}:{field}:{catalog_version()['version']}"
+
+
+def facet_values(model, field):
+    """Sorted distinct non-empty values of ``model.field`` in every branch database."""
+    key = facet_key(model, field)
+    values = cache.get(key)
+    if values is None:
+        def distinct(using):
+            return list(model.objects.using(using).order_by().values_list(field, flat=True).distinct())
+
+        values = sorted({value for shard in fan_out(distinct) for value in shard if value})
+        cache.set(key, values, FACET_TIMEOUT)
+    return values
+
+
+def add_facet_values(model, field, values):
+    """Add newly posted values to a seeded facet; an unseeded one seeds itself on first read."""
+    key = facet_key(model, field)
+    cached = cache.get(key)
+    if cached is None:
+        return
+    new = {value for value in values if value} - set(cached)
+    if new:
+        cache.set(key, sorted(new.union(cached)), FACET_TIMEOUT)
+
+
+def branch_choices():
+    """[(pk, label)] of every branch, cached until a branch changes."""
+    choices = cache.get(BRANCH_CHOICES_KEY)
+    if choices is None:
+        choices = [(str(branch.pk), str(branch)) for branch in Branch.objects.order_by('name', 'city')]
+        cache.set(BRANCH_CHOICES_KEY, choices, None)
+    return choices
+
+
+def clear_branch_choices():
+    cache.delete(BRANCH_CHOICES_KEY)
+
+
+class ProductNameFilter(admin.SimpleListFilter):
+    title = "product name"
+    parameter_name = "product_name"
+
+    def lookups(self, request, model_admin):
+        return [(name, name) for name in facet_values(model_admin.model, 'product_name')]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(product_name=self.value())
+        return queryset
+
+
+class ProductTypeFilter(admin.SimpleListFilter):
+    """Fixed product types, for ledgers whose product_type column has no choices."""
+    title = "product type"
+    parameter_name = "product_type"
+
+    def lookups(self, request, model_admin):
+        return PRODUCT_CHOICES
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(product_type=self.value())
+        return queryset
+
+
+class BranchFilter(admin.SimpleListFilter):
+    title = "branch"
+    parameter_name = "branch__id__exact"  # same query string as the default related-field filter
+
+    def lookups(self, request, model_admin):
+        return branch_choices()
+
+    def queryset(self, request, queryset):
+        if self.value():
+            try:
+                return queryset.filter(branch_id=self.value())
+            except (ValueError, ValidationError) as e:
+                raise IncorrectLookupParameters(e)
+        return queryset
@@ -1,19 +1,58 @@
 # bakery/forms.py
 from django import forms
-from .models import Inventory, Bread, Injera, Flour, Yeast, Enhancer
-from branches.models import Branch  # <-- use centralized Branch
+from .filters import branch_choices
+from .models import Inventory, PRODUCT_MODELS, Product
 
-MODEL_MAP = {
-    'bread': Bread,
-    'injera': Injera,
-    'flour': Flour,
-    'yeast': Yeast,
-    'enhancer': Enhancer,
-}
+
+# ------------------- Memoized lookups shared by the admin forms -------------------
+class ProductFormMixin:
+    """
+    Shared setup for forms with branch, product_type and product_choice fields.
+
+    The branch select is rendered from the cached branch list
+    (bakery.filters.branch_choices), so showing the form costs no branch
+    query. The product list of the selected type is read once per form (that
+    is, once per request) and reused by rendering, clean() and save(); it is
+    one (object_id, name) query on the registry.
+    """
+
+    def setup_product_fields(self):
+        """Fill the branch and product choices; returns the product type."""
+        # set on the widget: the field's own choices would query on every render
+        branch = self.fields['branch']
+        empty = [('', branch.empty_label)] if branch.empty_label is not None else []
+        branch.widget.choices = empty + branch_choices()
+
+        product_type = None
+        if self.data.get('product_type'):
+            product_type = self.data.get('product_type')
+        elif self.instance and getattr(self.instance, 'product_type', None):
+            product_type = self.instance.product_type
+
+        self.fields['product_choice'].choices = [('', '---------')] + [
+            (str(pk), name) for pk, name in self.product_names(product_type).items()
+        ]
+        return product_type
+
+    def product_names(self, product_type):
+        """{object_id: name} of one product type, memoized on the form."""
+        memo = self.__dict__.setdefault('_product_names', {})
+        if product_type not in memo:
+            memo[product_type] = {}
+            if product_type in PRODUCT_MODELS:
+                memo[product_type] = dict(
+                    Product.objects.filter(product_type=product_type)
+                    .order_by('name', 'object_id')
+                    .values_list('object_id', 'name')
+                )
+        return memo[product_type]
+
+    def product_name(self, product_type, product_id):
+        return self.product_names(product_type).get(product_id)
 
 
 # ------------------- InventoryForm -------------------
-class InventoryForm(forms.ModelForm):
+class InventoryForm(ProductFormMixin, forms.ModelForm):
     product_choice = forms.ChoiceField(choices=[('', '---------')], required=True, label="Product Name")
 
     class Meta:
@@ -23,23 +62,9 @@ class InventoryForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-        # Use centralized branches
-        self.fields['branch'].queryset = Branch.objects.all()
-
-        self.fields['product_choice'].choices = [('', '---------')]
-        product_type = None
-        if self.data.get('product_type'):
-            product_type = self.data.get('product_type')
-        elif self.instance and getattr(self.instance, 'product_type', None):
-            product_type = self.instance.product_type
-
-        if product_type in MODEL_MAP:
-            Model = MODEL_MAP[product_type]
-            qs = Model.objects.all()
-            choices = [('', '---------')] + [(str(o.pk), o.name) for o in qs]
-            self.fields['product_choice'].choices = choices
-            if self.instance and getattr(self.instance, 'product_id', None):
-                self.fields['product_choice'].initial = str(self.instance.product_id)
+        product_type = self.setup_product_fields()
+        if product_type in PRODUCT_MODELS and self.instance and getattr(self.instance, 'product_id', None):
+            self.fields['product_choice'].initial = str(self.instance.product_id)
 
         # ------------------- Quantity Label Customization -------------------
         if product_type in ['bread', 'injera']:
@@ -58,17 +83,30 @@ class InventoryForm(forms.ModelForm):
         except (ValueError, TypeError):
             raise forms.ValidationError("Invalid selection.")
 
+    def clean(self):
+        cleaned_data = super().clean()
+        branch = cleaned_data.get('branch')
+        product_type = cleaned_data.get('product_type')
+        product_id = cleaned_data.get('product_choice')
+
+        # product_id is not a model field on this form, so Django skips the
+        # unique constraint check; do it here instead of failing on save.
+        if branch and product_type and product_id:
+            duplicate = Inventory.objects.filter(
+                branch=branch, product_type=product_type, product_id=product_id
+            ).exclude(pk=self.instance.pk)
+            if duplicate.exists():
+                raise forms.ValidationError(
+                    "An inventory record for this product already exists in this branch."
+                )
+        return cleaned_data
+
     def save(self, commit=True):
         instance = super().save(commit=False)
         product_id = self.cleaned_data.get('product_choice')
         instance.product_id = product_id
-        Model = MODEL_MAP.get(instance.product_type)
-        if Model:
-            try:
-                obj = Model.objects.get(pk=product_id)
-                instance.product_name = obj.name
-            except Model.DoesNotExist:
-                instance.product_name = ""
+        if instance.product_type in PRODUCT_MODELS:
+            instance.product_name = self.product_name(instance.product_type, product_id) or ""
         if commit:
             instance.save()
         return instance
\ No newline at end of file
@@ -0,0 +1,204 @@
+# bakery/management/commands/reconcile_inventory.py
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Max, Sum
+from django.utils import timezone
+
+from bakery.filters import add_facet_values
+from bakery.models import Inventory, InventoryCheckpoint, Product
+from branches.sharding import shard_aliases
+from StockTransaction.models import SIGNED_QUANTITY, StockTransaction
+
+KEY_FIELDS = ('branch_id', 'product_type', 'product_id')
+TOLERANCE = 1e-6
+BATCH_SIZE = 500
+SHOW_ROWS = 50
+
+
+def ledger_balances(movements):
+    """
+    ({(branch_id, product_type, product_id): stock}, number of movements),
+    summed in one grouped query.
+    """
+    rows = (
+        movements.order_by().values(*KEY_FIELDS)
+        .annotate(total=Sum(SIGNED_QUANTITY), movements=Count('id'))
+        .values_list(*KEY_FIELDS, 'total', 'movements')
+    )
+    balances, count = {}, 0
+    for branch_id, product_type, product_id, total, movements in rows:
+        balances[branch_id, product_type, product_id] = total
+        count += movements
+    return balances, count
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare Inventory quantities with the StockTransaction ledger and optionally "
+        "repair them. Starts from the checkpoint of the previous run unless --full is given. "
+        "Each row is expected to hold its baseline (opening balance and corrections made by "
+        "hand) plus its ledger stock; rows whose baseline is unknown are listed but never "
+        "repaired until --adopt accepts their current quantity."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repair', action='store_true', help="Set drifted Inventory rows to the ledger's stock.")
+        parser.add_argument('--full', action='store_true', help="Ignore the checkpoint and sum the whole ledger.")
+        parser.add_argument(
+            '--adopt', action='store_true',
+            help="Accept the current quantity of rows with an unknown baseline and derive it from the ledger.",
+        )
+
+    def handle(self, *args, **options):
+        for using in shard_aliases():
+            drift, unknown, checked = self.reconcile(using, options['full'], options['repair'], options['adopt'])
+            for (branch_id, product_type, product_id), _, have, baseline, stock in drift[:SHOW_ROWS]:
+                self.stdout.write(
+                    f"  branch {branch_id} {product_type}:{product_id}: inventory {have:g}, "
+                    f"baseline {baseline:g} + ledger {stock:g}"
+                )
+            if len(drift) > SHOW_ROWS:
+                self.stdout.write(f"  ... and {len(drift) - SHOW_ROWS} more")
+            outcome = "repaired" if options['repair'] and drift else "found"
+            style = self.style.WARNING if drift and not options['repair'] else self.style.SUCCESS
+            self.stdout.write(style(f"{using}: {len(drift)} drifted row(s) {outcome} among {checked} product(s)."))
+            if unknown and options['adopt']:
+                self.stdout.write(self.style.SUCCESS(
+                    f"{using}: {len(unknown)} inventory row(s) with an unknown baseline adopted as they stand."
+                ))
+            elif unknown:
+                self.stdout.write(self.style.WARNING(
+                    f"{using}: {len(unknown)} inventory row(s) have an unknown baseline (quantities set by hand "
+                    f"before baselines were kept); not repaired, see --adopt:"
+                ))
+                for (branch_id, product_type, product_id), _, have, _, stock in unknown[:SHOW_ROWS]:
+                    self.stdout.write(
+                        f"  branch {branch_id} {product_type}:{product_id}: inventory {have:g}, ledger {stock:g}"
+                    )
+
+    def reconcile(self, using, full, repair, adopt=False):
+        """
+        Returns ([(key, inventory pk, inventory quantity, baseline, ledger
+        stock)] of the drifted rows, the same for rows whose baseline is
+        unknown, products checked).
+        """
+        ledger = StockTransaction.objects.using(using).filter(product_id__isnull=False)
+        checkpoint = None if full else self.load_checkpoint(using)
+        balances, through_id, rows, since = checkpoint or (None, 0, 0, None)
+
+        # the long part (the whole ledger on a first or --full run) without
+        # holding the write lock...
+        started = timezone.now()
+        balances, through_id, rows = self.catch_up(ledger, balances, through_id, rows, since)
+
+        # ...then, with postings paused, the few rows saved meanwhile and the
+        # comparison against Inventory as it stands at the same moment
+        with transaction.atomic(using=using):
+            checked_at = timezone.now()
+            balances, through_id, rows = self.catch_up(ledger, balances, through_id, rows, started)
+            inventory = {
+                (branch_id, product_type, product_id): (pk, quantity, baseline)
+                for pk, branch_id, product_type, product_id, quantity, baseline in
+                Inventory.objects.using(using).values_list('pk', *KEY_FIELDS, 'quantity', 'baseline')
+            }
+            drift, unknown = [], []
+            for key in sorted(balances.keys() | inventory.keys()):
+                stock = balances.get(key) or 0.0
+                pk, have, baseline = inventory.get(key, (None, 0.0, 0.0))
+                if baseline is None:
+                    # set by hand before baselines were kept: drift and
+                    # stock the ledger never saw look the same
+                    unknown.append((key, pk, have, baseline, stock))
+                elif abs(baseline + stock - have) > TOLERANCE:
+                    drift.append((key, pk, have, baseline, stock))
+            if repair and drift:
+                self.repair(using, drift)
+            if adopt and unknown:
+                self.adopt(using, unknown)
+            self.save_checkpoint(using, balances, through_id, rows, checked_at)
+        return drift, unknown, len(balances.keys() | inventory.keys())
+
+    def catch_up(self, ledger, balances, through_id, rows, since):
+        """
+        Bring ``balances``, the ledger summed over the ``rows`` movements with
+        ids up to ``through_id``, up to the newest movement. If any of those
+        was edited after ``since`` (it may have moved to another product or
+        branch) or deleted, the whole ledger is summed again instead.
+        Returns (balances, through_id, rows) as of the newest movement.
+        """
+        newest = ledger.aggregate(newest=Max('id'))['newest'] or 0
+        if balances is not None:
+            # only the updated_at range goes to SQL: given an id bound as
+            # well, SQLite walks the primary key instead of the updated_at index
+            edited = any(
+                pk <= through_id for pk in ledger.filter(updated_at__gt=since).order_by().values_list('id', flat=True)
+            )
+            if edited or ledger.filter(id__lte=through_id).count() != rows:
+                balances = None
+        if balances is None:
+            balances, rows = ledger_balances(ledger.filter(id__lte=newest))
+            return balances, newest, rows
+
+        balances = dict(balances)
+        deltas, added = ledger_balances(ledger.filter(id__gt=through_id, id__lte=newest))
+        for key, delta in deltas.items():
+            balances[key] = (balances.get(key) or 0.0) + delta
+        return balances, newest, rows + added
+
+    def repair(self, using, drift):
+        now = timezone.now()
+        rows = Inventory.objects.using(using).in_bulk([pk for _, pk, _, _, _ in drift if pk])
+        for _, pk, _, baseline, stock in drift:
+            if pk:
+                rows[pk].quantity = baseline + stock
+                rows[pk].last_updated = now
+        Inventory.objects.using(using).bulk_update(rows.values(), ['quantity', 'last_updated'], batch_size=BATCH_SIZE)
+
+        # stock the ledger knows about but Inventory has no row for
+        missing = [(key, stock) for key, pk, _, _, stock in drift if not pk]
+        names = dict(
+            Product.objects.using(using)
+            .filter(key__in=[Product.key_for(product_type, product_id) for (_, product_type, product_id), _ in missing])
+            .values_list('key', 'name')
+        )
+        created = []
+        for (branch_id, product_type, product_id), expected in missing:
+            key = Product.key_for(product_type, product_id)
+            created.append(Inventory(
+                branch_id=branch_id, product_type=product_type, product_id=product_id,
+                product_name=names.get(key, ''), catalog_product_id=key if key in names else None,
+                quantity=expected, last_updated=now,
+            ))
+        Inventory.objects.using(using).bulk_create(created, batch_size=BATCH_SIZE)
+        add_facet_values(Inventory, 'product_name', [row.product_name for row in created])
+
+    def adopt(self, using, unknown):
+        """Take the rows' quantities as correct: whatever the ledger does not explain is baseline."""
+        Inventory.objects.using(using).bulk_update(
+            [Inventory(pk=pk, baseline=have - stock) for _, pk, have, _, stock in unknown],
+            ['baseline'], batch_size=BATCH_SIZE,
+        )
+
+    def load_checkpoint(self, using):
+        rows = list(
+            InventoryCheckpoint.objects.using(using)
+            .values_list(*KEY_FIELDS, 'quantity', 'through_id', 'ledger_rows', 'checked_at')
+        )
+        if not rows:
+            return None
+        balances = {(branch_id, product_type, product_id): quantity
+                    for branch_id, product_type, product_id, quantity, _, _, _ in rows}
+        return balances, rows[0][4], rows[0][5], rows[0][6]
+
+    def save_checkpoint(self, using, balances, through_id, rows, checked_at):
+        InventoryCheckpoint.objects.using(using).all().delete()
+        InventoryCheckpoint.objects.using(using).bulk_create(
+            [
+                InventoryCheckpoint(
+                    branch_id=branch_id, product_type=product_type, product_id=product_id,
+                    quantity=quantity or 0.0, through_id=through_id, ledger_rows=rows, checked_at=checked_at,
+                )
+                for (branch_id, product_type, product_id), quantity in balances.items()
+            ],
+            batch_size=BATCH_SIZE,
+        )
@@ -0,0 +1,41 @@
+# bakery/management/commands/refresh_reporting_db.py
+import sqlite3
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from bakery.db import REPORTING_ALIAS
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the primary SQLite database into the reporting alias with SQLite's "
+        "online backup API. Cashier writes continue while the copy is taken."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, help="Keep refreshing every N seconds.")
+
+    def handle(self, *args, **options):
+        if REPORTING_ALIAS not in connections.databases:
+            raise CommandError(f"No '{REPORTING_ALIAS}' database is configured.")
+        source = connections.databases[DEFAULT_DB_ALIAS]['NAME']
+        target = connections.databases[REPORTING_ALIAS]['NAME']
+        while True:
+            started = time.monotonic()
+            self.refresh(source, target)
+            self.stdout.write(f"Refreshed {target} in {time.monotonic() - started:.2f}s.")
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
+
+    def refresh(self, source, target):
+        src = sqlite3.connect(source, timeout=20)
+        dst = sqlite3.connect(target, timeout=20)
+        try:
+            # all pages in one step: one read snapshot of the primary, which in
+            # WAL mode never blocks writers; stepped copies restart on every write
+            src.backup(dst, pages=-1)
+        finally:
+            dst.close()
+            src.close()
@@ -0,0 +1,85 @@
+# bakery/management/commands/shard_benchmark.py
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from .sqlite_benchmark import Command as SQLiteBenchmark, configured_profile
+
+
+class Command(SQLiteBenchmark):
+    help = (
+        "Compare write throughput of concurrent branch cashiers on scratch SQLite "
+        "files: every branch in one database vs. one database per branch "
+        "(BRANCH_SHARDS), for a growing number of branches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=5.0, help="Duration of each run.")
+        parser.add_argument('--branches', type=int, nargs='+', default=[1, 2, 4, 8], help="Branch counts to try.")
+        parser.add_argument('--writers', type=int, default=2, help="Writing connections per branch.")
+        parser.add_argument('--rows', type=int, default=20000, help="Ledger rows to seed per database.")
+        parser.add_argument('--synchronous', choices=['NORMAL', 'FULL'],
+                            help="Override the configured synchronous pragma (FULL: a flush per commit).")
+
+    def handle(self, *args, **options):
+        profile = configured_profile()
+        if options['synchronous']:
+            profile['pragmas'].append(f"PRAGMA synchronous={options['synchronous']}")
+        seconds = options['seconds']
+        self.stdout.write(f"{'branches':<10}{'shared writes/s':>17}{'sharded writes/s':>18}{'lock errors':>13}")
+        for branches in options['branches']:
+            with tempfile.TemporaryDirectory() as directory:
+                shared = os.path.join(directory, 'shared.sqlite3')
+                self.seed(shared, options['rows'])
+                paths = []
+                for branch in range(branches):
+                    paths.append(os.path.join(directory, f'branch_{branch}.sqlite3'))
+                    self.seed(paths[-1], options['rows'])
+                shared_writes, shared_errors = self.run_writers([shared] * branches, profile, options)
+                sharded_writes, sharded_errors = self.run_writers(paths, profile, options)
+            self.stdout.write(
+                f"{branches:<10}{shared_writes / seconds:>17.0f}{sharded_writes / seconds:>18.0f}"
+                f"{shared_errors + sharded_errors:>13}"
+            )
+
+    def run_writers(self, paths, profile, options):
+        """``writers`` sale-shaped writers per branch, branch i writing to paths[i]; returns (writes, errors)."""
+        counts = {'writes': 0, 'errors': 0}
+        lock = threading.Lock()
+        deadline = time.monotonic() + options['seconds']
+
+        def bump(key):
+            with lock:
+                counts[key] += 1
+
+        def writer(path, branch):
+            conn = self.connect(path, profile)
+            while time.monotonic() < deadline:
+                try:
+                    conn.execute(profile['begin'])
+                    conn.execute("SELECT quantity FROM stock WHERE branch = ?", (branch,)).fetchone()
+                    conn.execute("UPDATE stock SET quantity = quantity - 1 WHERE branch = ?", (branch,))
+                    conn.execute(
+                        "INSERT INTO ledger (branch, quantity, created_at) VALUES (?, ?, datetime('now'))",
+                        (branch, random.random()),
+                    )
+                    conn.execute("COMMIT")
+                    bump('writes')
+                except sqlite3.OperationalError:
+                    if conn.in_transaction:
+                        conn.execute("ROLLBACK")
+                    bump('errors')
+            conn.close()
+
+        threads = [
+            threading.Thread(target=writer, args=(path, branch % 10))
+            for branch, path in enumerate(paths) for _ in range(options['writers'])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return counts['writes'], counts['errors']
@@ -0,0 +1,33 @@
+# bakery/management/commands/snapshot_inventory.py
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from bakery.models import InventorySnapshot
+from branches.sharding import shard_aliases
+
+
+class Command(BaseCommand):
+    help = (
+        "Snapshot every branch's inventory, so stock-as-of queries only replay "
+        "the stock movements made since the nearest snapshot."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, help="Keep taking a snapshot every N seconds.")
+        parser.add_argument('--keep-days', type=int, help="Delete snapshots older than this many days.")
+
+    def handle(self, *args, **options):
+        while True:
+            for using in shard_aliases():
+                written = InventorySnapshot.take(using=using)
+                self.stdout.write(f"{using}: snapshot of {written} inventory row(s).")
+                if options['keep_days']:
+                    cutoff = timezone.now() - timedelta(days=options['keep_days'])
+                    deleted, _ = InventorySnapshot.objects.using(using).filter(created_at__lt=cutoff).delete()
+                    if deleted:
+                        self.stdout.write(f"{using}: deleted {deleted} old snapshot row(s).")
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,120 @@
+# bakery/management/commands/sqlite_benchmark.py
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# the stock setup: rollback journal, deferred BEGIN, Python's 5 s busy timeout
+DEFAULT_PROFILE = {'pragmas': [], 'begin': 'BEGIN', 'timeout': 5.0}
+
+
+def configured_profile():
+    options = settings.DATABASES['default'].get('OPTIONS', {})
+    return {
+        # the pragmas come with the production profile (NokoDabo.profiles)
+        'pragmas': [cmd.strip() for cmd in options.get('init_command', '').split(';') if cmd.strip()]
+        or settings.SQLITE_PRAGMAS,
+        'begin': f"BEGIN {options.get('transaction_mode', '')}".strip(),
+        'timeout': options.get('timeout', 5.0),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare read/write throughput of concurrent branch users on a scratch "
+        "SQLite file: stock settings vs. the configured DATABASES profile."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=5.0, help="Duration of each run.")
+        parser.add_argument('--writers', type=int, default=4, help="Concurrent writing connections.")
+        parser.add_argument('--readers', type=int, default=4, help="Concurrent reading connections.")
+        parser.add_argument('--rows', type=int, default=20000, help="Ledger rows to seed.")
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'profile':<12}{'writes/s':>10}{'reads/s':>10}{'lock errors':>13}")
+        for name, profile in (('default', DEFAULT_PROFILE), ('configured', configured_profile())):
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'bench.sqlite3')
+                self.seed(path, options['rows'])
+                writes, reads, errors = self.run(path, profile, options)
+            seconds = options['seconds']
+            self.stdout.write(f"{name:<12}{writes / seconds:>10.0f}{reads / seconds:>10.0f}{errors:>13}")
+
+    def connect(self, path, profile):
+        conn = sqlite3.connect(path, timeout=profile['timeout'], isolation_level=None, check_same_thread=False)
+        for pragma in profile['pragmas']:
+            conn.execute(pragma)
+        return conn
+
+    def seed(self, path, rows):
+        conn = sqlite3.connect(path, isolation_level=None)
+        conn.execute("CREATE TABLE stock (branch INTEGER PRIMARY KEY, quantity REAL NOT NULL)")
+        conn.execute(
+            "CREATE TABLE ledger (id INTEGER PRIMARY KEY, branch INTEGER, quantity REAL, created_at TEXT)"
+        )
+        conn.execute("CREATE INDEX ledger_branch ON ledger (branch)")
+        conn.execute("BEGIN")
+        conn.executemany("INSERT INTO stock VALUES (?, ?)", [(b, 1e9) for b in range(10)])
+        conn.executemany(
+            "INSERT INTO ledger (branch, quantity, created_at) VALUES (?, ?, datetime('now'))",
+            [(i % 10, 1.0) for i in range(rows)],
+        )
+        conn.execute("COMMIT")
+        conn.close()
+
+    def run(self, path, profile, options):
+        """Sale-shaped write transactions vs. report-shaped reads; returns (writes, reads, errors)."""
+        counts = {'writes': 0, 'reads': 0, 'errors': 0}
+        lock = threading.Lock()
+        deadline = time.monotonic() + options['seconds']
+
+        def bump(key):
+            with lock:
+                counts[key] += 1
+
+        def writer():
+            conn = self.connect(path, profile)
+            while time.monotonic() < deadline:
+                branch = random.randrange(10)
+                try:
+                    # read-then-write, like a stock-out: a deferred BEGIN has
+                    # to upgrade its read lock here and may fail outright
+                    conn.execute(profile['begin'])
+                    conn.execute("SELECT quantity FROM stock WHERE branch = ?", (branch,)).fetchone()
+                    conn.execute("UPDATE stock SET quantity = quantity - 1 WHERE branch = ?", (branch,))
+                    conn.execute(
+                        "INSERT INTO ledger (branch, quantity, created_at) VALUES (?, 1, datetime('now'))",
+                        (branch,),
+                    )
+                    conn.execute("COMMIT")
+                    bump('writes')
+                except sqlite3.OperationalError:
+                    if conn.in_transaction:
+                        conn.execute("ROLLBACK")
+                    bump('errors')
+            conn.close()
+
+        def reader():
+            conn = self.connect(path, profile)
+            while time.monotonic() < deadline:
+                try:
+                    conn.execute(
+                        "SELECT COUNT(*), SUM(quantity) FROM ledger WHERE branch = ?", (random.randrange(10),)
+                    ).fetchone()
+                    bump('reads')
+                except sqlite3.OperationalError:
+                    bump('errors')
+            conn.close()
+
+        threads = [threading.Thread(target=writer) for _ in range(options['writers'])]
+        threads += [threading.Thread(target=reader) for _ in range(options['readers'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return counts['writes'], counts['reads'], counts['errors']
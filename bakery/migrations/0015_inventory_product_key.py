@@ -0,0 +1,80 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:43
+
+from django.db import migrations, models
+from django.db.models import Max, Min, Sum
+
+
+def merge_duplicate_inventory(apps, schema_editor):
+    """Resolve missing product ids by name, then fold duplicate rows into one."""
+    db = schema_editor.connection.alias
+    Inventory = apps.get_model('bakery', 'Inventory')
+
+    for inventory in Inventory.objects.using(db).filter(product_id=0):
+        Model = apps.get_model('bakery', inventory.product_type)
+        product_id = (
+            Model.objects.using(db).filter(name=inventory.product_name)
+            .values_list('pk', flat=True).first()
+        )
+        if product_id:
+            Inventory.objects.using(db).filter(pk=inventory.pk).update(product_id=product_id)
+
+    # rows still without a product id can only be told apart by name
+    fold_duplicates(Inventory.objects.using(db).exclude(product_id=0), ['branch', 'product_type', 'product_id'])
+    unresolved = Inventory.objects.using(db).filter(product_id=0)
+    fold_duplicates(unresolved, ['branch', 'product_type', 'product_name'])
+
+    # differently named ones in one branch would break the unique key
+    clashes = (
+        unresolved.values('branch', 'product_type')
+        .annotate(rows=models.Count('pk')).filter(rows__gt=1)
+        .values_list('branch', 'product_type')
+    )
+    if clashes:
+        lookup = models.Q()
+        for branch, product_type in clashes:
+            lookup |= models.Q(branch=branch, product_type=product_type)
+        listing = "\n".join(
+            f"  id {row.pk}: branch {row.branch_id}, {row.product_type} '{row.product_name}'"
+            for row in unresolved.filter(lookup).order_by('branch', 'product_type', 'pk')
+        )
+        raise RuntimeError(
+            "These inventory rows name no catalog product and share a branch and product type, "
+            "so they cannot be keyed on (branch, product_type, product_id). Rename them to a "
+            "catalog product or delete them, then migrate again:\n" + listing
+        )
+
+
+def fold_duplicates(inventory, fields):
+    """Merge rows of ``inventory`` that agree on ``fields`` into the oldest one."""
+    duplicates = (
+        inventory.values(*fields)
+        .annotate(rows=models.Count('pk'), keep=Min('pk'),
+                  total=Sum('quantity'), updated=Max('last_updated'))
+        .filter(rows__gt=1)
+    )
+    for group in duplicates:
+        rows = inventory.filter(**{field: group[field] for field in fields})
+        rows.filter(pk=group['keep']).update(
+            quantity=group['total'], last_updated=group['updated']
+        )
+        rows.exclude(pk=group['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bakery', '0014_flour_delete_wheatflour_and_more'),
+        ('branches', '0004_alter_userbranch_branch'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_inventory, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='inventory',
+            index=models.Index(fields=['branch', 'product_type', 'product_id', 'quantity'], name='inventory_stock_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='inventory',
+            constraint=models.UniqueConstraint(fields=('branch', 'product_type', 'product_id'), name='unique_inventory_product'),
+        ),
+    ]
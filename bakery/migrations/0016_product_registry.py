@@ -0,0 +1,76 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Value
+from django.db.models.functions import Cast, Concat
+
+PRODUCT_TYPES = ('bread', 'injera', 'flour', 'yeast', 'enhancer')
+
+
+def fill_product_registry(apps, schema_editor):
+    db = schema_editor.connection.alias
+    Product = apps.get_model('bakery', 'Product')
+    products = []
+    for product_type in PRODUCT_TYPES:
+        for obj in apps.get_model('bakery', product_type).objects.using(db):
+            price = getattr(obj, 'selling_price', None)
+            if price is None:
+                price = obj.cost_per_kg
+            products.append(Product(
+                key=f"{product_type}:{obj.pk}",
+                product_type=product_type,
+                object_id=obj.pk,
+                name=obj.name,
+                price=price,
+            ))
+    Product.objects.using(db).bulk_create(products, batch_size=500)
+
+
+def link_catalog_products(apps, schema_editor, model_label):
+    """Point each row at its registry entry ("<product_type>:<product_id>")."""
+    db = schema_editor.connection.alias
+    Model = apps.get_model(*model_label.split('.'))
+    Product = apps.get_model('bakery', 'Product')
+    Model.objects.using(db).filter(product_id__isnull=False).update(
+        catalog_product_id=Concat('product_type', Value(':'), Cast('product_id', models.CharField()))
+    )
+    Model.objects.using(db).exclude(
+        catalog_product_id__in=Product.objects.using(db).values('key')
+    ).update(catalog_product_id=None)
+
+
+def link_inventory(apps, schema_editor):
+    link_catalog_products(apps, schema_editor, 'bakery.Inventory')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bakery', '0015_inventory_product_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Product',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=40, unique=True)),
+                ('product_type', models.CharField(choices=[('bread', 'Bread'), ('injera', 'Injera'), ('flour', 'Flour'), ('yeast', 'Yeast'), ('enhancer', 'Enhancer')], max_length=20)),
+                ('object_id', models.PositiveIntegerField()),
+                ('name', models.CharField(db_index=True, max_length=100)),
+                ('price', models.DecimalField(decimal_places=2, default=0, max_digits=8)),
+            ],
+            options={
+                'ordering': ['product_type', 'name'],
+                'indexes': [models.Index(fields=['product_type', 'name'], name='bakery_prod_product_823c07_idx')],
+            },
+        ),
+        migrations.AddField(
+            model_name='inventory',
+            name='catalog_product',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, to='bakery.product', to_field='key'),
+        ),
+        migrations.RunPython(fill_product_registry, migrations.RunPython.noop),
+        migrations.RunPython(link_inventory, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,94 @@
+from django.db import migrations
+
+BRANCH = "(SELECT b.name || ' ' || b.city FROM branches_branch b WHERE b.id = {row}.branch_id)"
+
+# table -> (indexed column -> SQL expression over the ledger row)
+INDEXES = {
+    'bakery_inventory': {
+        'product_name': '{row}.product_name',
+        'product_type': '{row}.product_type',
+        'branch': BRANCH,
+    },
+    'StockTransaction_stocktransaction': {
+        'product_name': '{row}.product_name',
+        'product_type': '{row}.product_type',
+        'transaction_type': '{row}.transaction_type',
+        'branch': BRANCH,
+    },
+    'finance_transaction': {
+        'product_name': '{row}.product_name',
+        'product_type': '{row}.product_type',
+        'transaction_type': '{row}.transaction_type',
+        'branch': BRANCH,
+        'reference': "COALESCE({row}.source_app, '') || ' ' || COALESCE({row}.source_id, '')",
+    },
+}
+
+
+# ledger columns whose updates re-index a row
+WATCHED = {
+    'bakery_inventory': ('product_name', 'product_type', 'branch_id'),
+    'StockTransaction_stocktransaction': ('product_name', 'product_type', 'transaction_type', 'branch_id'),
+    'finance_transaction': ('product_name', 'product_type', 'transaction_type', 'branch_id', 'source_app', 'source_id'),
+}
+
+
+def index_sql(table, columns):
+    fts = f'{table}_fts'
+    names = ', '.join(columns)
+
+    def values(row):
+        return ', '.join(expr.format(row=row) for expr in columns.values())
+
+    # only these columns feed the index; quantity updates leave it alone
+    watched = ', '.join(WATCHED[table])
+    return [
+        f"CREATE VIRTUAL TABLE \"{fts}\" USING fts5({names}, tokenize='unicode61 remove_diacritics 2')",
+        f'INSERT INTO "{fts}"(rowid, {names}) SELECT t.id, {values("t")} FROM "{table}" t',
+        f'CREATE TRIGGER "{fts}_ai" AFTER INSERT ON "{table}" BEGIN '
+        f'INSERT INTO "{fts}"(rowid, {names}) VALUES (NEW.id, {values("NEW")}); END',
+        f'CREATE TRIGGER "{fts}_ad" AFTER DELETE ON "{table}" BEGIN '
+        f'DELETE FROM "{fts}" WHERE rowid = OLD.id; END',
+        f'CREATE TRIGGER "{fts}_au" AFTER UPDATE OF {watched} ON "{table}" BEGIN '
+        f'DELETE FROM "{fts}" WHERE rowid = OLD.id; '
+        f'INSERT INTO "{fts}"(rowid, {names}) VALUES (NEW.id, {values("NEW")}); END',
+        f'CREATE TRIGGER "{fts}_branch" AFTER UPDATE OF name, city ON branches_branch BEGIN '
+        f'UPDATE "{fts}" SET branch = NEW.name || \' \' || NEW.city '
+        f'WHERE rowid IN (SELECT id FROM "{table}" WHERE branch_id = NEW.id); END',
+    ]
+
+
+def drop_sql(table):
+    fts = f'{table}_fts'
+    return [f'DROP TRIGGER IF EXISTS "{fts}_{suffix}"' for suffix in ('ai', 'ad', 'au', 'branch')] + [
+        f'DROP TABLE IF EXISTS "{fts}"'
+    ]
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for table, columns in INDEXES.items():
+        for sql in index_sql(table, columns):
+            schema_editor.execute(sql)
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for table in INDEXES:
+        for sql in drop_sql(table):
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bakery', '0016_product_registry'),
+        ('StockTransaction', '0005_created_at_index'),
+        ('finance', '0007_financedailyrollup'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-18 13:13
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bakery', '0017_ledger_search'),
+        ('branches', '0004_alter_userbranch_branch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventorySnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_type', models.CharField(choices=[('bread', 'Bread'), ('injera', 'Injera'), ('flour', 'Flour'), ('yeast', 'Yeast'), ('enhancer', 'Enhancer')], max_length=20)),
+                ('product_id', models.PositiveIntegerField()),
+                ('product_name', models.CharField(blank=True, max_length=100)),
+                ('quantity', models.FloatField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='branches.branch')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['branch', 'product_type', 'product_id', 'created_at'], name='invsnapshot_product_time_idx'), models.Index(fields=['branch', 'created_at'], name='invsnapshot_branch_time_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.6 on 2026-10-18 13:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bakery', '0018_inventory_snapshots'),
+        ('branches', '0004_alter_userbranch_branch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_type', models.CharField(choices=[('bread', 'Bread'), ('injera', 'Injera'), ('flour', 'Flour'), ('yeast', 'Yeast'), ('enhancer', 'Enhancer')], max_length=20)),
+                ('product_id', models.PositiveIntegerField()),
+                ('quantity', models.FloatField()),
+                ('through_id', models.PositiveBigIntegerField()),
+                ('checked_at', models.DateTimeField()),
+                ('branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='branches.branch')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('branch', 'product_type', 'product_id'), name='unique_inventory_checkpoint')],
+            },
+        ),
+    ]
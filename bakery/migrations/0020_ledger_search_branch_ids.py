@@ -0,0 +1,103 @@
+"""
+Rebuild the ledger search indexes of 0017 without reading branches_branch.
+
+0017's triggers looked each row's branch name up in branches_branch, and a
+trigger on branches_branch re-indexed the ledgers when a branch was renamed.
+SQLite checks every trigger that names a table when that table is dropped or
+renamed, so the schema editor could no longer rebuild branches_branch (to
+alter Branch.address, say), nor a ledger table without dropping its index
+first. The index now holds the row's branch as a token of its id ("b12")
+and bakery.search turns branch names in a query into those tokens, so the
+triggers only touch their own table and a renamed branch needs no reindex.
+
+Future migrations: rebuilding a ledger table on SQLite (AlterField, most
+AddField, constraint changes) drops its triggers along with the old table.
+Wrap such operations in around_rebuild(TABLE, [...]) from this module (load
+it with import_module, as StockTransaction 0007 does for 0017) to build the
+table's index again afterwards.
+"""
+from importlib import import_module
+
+from django.db import migrations
+
+previous = import_module('bakery.migrations.0017_ledger_search')
+
+# bakery.search.branch_token() builds the same token
+BRANCH = "'b' || {row}.branch_id"
+
+# table -> (indexed column -> SQL expression over the ledger row)
+INDEXES = {
+    table: {**columns, 'branch': BRANCH}
+    for table, columns in previous.INDEXES.items()
+}
+WATCHED = previous.WATCHED
+
+
+def index_sql(table, columns=None):
+    fts = f'{table}_fts'
+    columns = columns or INDEXES[table]
+    names = ', '.join(columns)
+
+    def values(row):
+        return ', '.join(expr.format(row=row) for expr in columns.values())
+
+    # only these columns feed the index; quantity updates leave it alone
+    watched = ', '.join(WATCHED[table])
+    return [
+        f"CREATE VIRTUAL TABLE \"{fts}\" USING fts5({names}, tokenize='unicode61 remove_diacritics 2')",
+        f'INSERT INTO "{fts}"(rowid, {names}) SELECT t.id, {values("t")} FROM "{table}" t',
+        f'CREATE TRIGGER "{fts}_ai" AFTER INSERT ON "{table}" BEGIN '
+        f'INSERT INTO "{fts}"(rowid, {names}) VALUES (NEW.id, {values("NEW")}); END',
+        f'CREATE TRIGGER "{fts}_ad" AFTER DELETE ON "{table}" BEGIN '
+        f'DELETE FROM "{fts}" WHERE rowid = OLD.id; END',
+        f'CREATE TRIGGER "{fts}_au" AFTER UPDATE OF {watched} ON "{table}" BEGIN '
+        f'DELETE FROM "{fts}" WHERE rowid = OLD.id; '
+        f'INSERT INTO "{fts}"(rowid, {names}) VALUES (NEW.id, {values("NEW")}); END',
+    ]
+
+
+drop_sql = previous.drop_sql
+
+
+def around_rebuild(table, operations):
+    """``operations`` with ``table``'s search index dropped before and built again after."""
+    def drop(apps, schema_editor):
+        if schema_editor.connection.vendor == 'sqlite':
+            for sql in drop_sql(table):
+                schema_editor.execute(sql)
+
+    def create(apps, schema_editor):
+        if schema_editor.connection.vendor == 'sqlite':
+            for sql in index_sql(table):
+                schema_editor.execute(sql)
+
+    return [migrations.RunPython(drop, create), *operations, migrations.RunPython(create, drop)]
+
+
+def use_branch_ids(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for table in INDEXES:
+        for sql in drop_sql(table) + index_sql(table):
+            schema_editor.execute(sql)
+
+
+def use_branch_names(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for table in INDEXES:
+        for sql in drop_sql(table) + previous.index_sql(table, previous.INDEXES[table]):
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bakery', '0019_inventory_checkpoint'),
+        ('StockTransaction', '0007_stocktransaction_updated_at'),
+        ('finance', '0008_transaction_source_unique'),
+    ]
+
+    operations = [
+        migrations.RunPython(use_branch_ids, use_branch_names),
+    ]
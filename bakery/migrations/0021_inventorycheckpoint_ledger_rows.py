@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 13:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bakery', '0020_ledger_search_branch_ids'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventorycheckpoint',
+            name='ledger_rows',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
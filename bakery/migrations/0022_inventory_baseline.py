@@ -0,0 +1,65 @@
+"""
+Inventory.baseline: the stock a row holds besides the StockTransaction
+ledger (opening balances, corrections made by hand), so reconcile_inventory
+can tell drift from stock the ledger never recorded.
+
+Existing rows get the baseline their history allows: a row without stock
+movements is all baseline, a row that agrees with its ledger has none, and
+for any other row it cannot be told apart from drift and is left unknown
+(None) until ``reconcile_inventory --adopt`` accepts its quantity.
+"""
+from importlib import import_module
+
+from django.db import migrations, models
+from django.db.models import Case, F, Sum, Value, When
+
+around_rebuild = import_module('bakery.migrations.0020_ledger_search_branch_ids').around_rebuild
+
+TOLERANCE = 1e-6
+
+
+def set_baselines(apps, schema_editor):
+    using = schema_editor.connection.alias
+    Inventory = apps.get_model('bakery', 'Inventory')
+    StockTransaction = apps.get_model('StockTransaction', 'StockTransaction')
+    signed = Case(
+        When(transaction_type='in', then=F('quantity')),
+        When(transaction_type='out', then=-F('quantity')),
+        default=Value(0.0),
+        output_field=models.FloatField(),
+    )
+    ledger = {
+        (branch_id, product_type, product_id): total
+        for branch_id, product_type, product_id, total in
+        StockTransaction.objects.using(using).filter(product_id__isnull=False).order_by()
+        .values('branch_id', 'product_type', 'product_id').annotate(total=Sum(signed))
+        .values_list('branch_id', 'product_type', 'product_id', 'total')
+    }
+    rows = list(Inventory.objects.using(using).only('branch_id', 'product_type', 'product_id', 'quantity'))
+    for row in rows:
+        key = (row.branch_id, row.product_type, row.product_id)
+        if key not in ledger:
+            row.baseline = row.quantity
+        elif abs(row.quantity - (ledger[key] or 0.0)) <= TOLERANCE:
+            row.baseline = 0.0
+        else:
+            row.baseline = None
+    Inventory.objects.using(using).bulk_update(rows, ['baseline'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bakery', '0021_inventorycheckpoint_ledger_rows'),
+        ('StockTransaction', '0007_stocktransaction_updated_at'),
+    ]
+
+    operations = around_rebuild('bakery_inventory', [
+        migrations.AddField(
+            model_name='inventory',
+            name='baseline',
+            field=models.FloatField(default=0, editable=False, null=True),
+        ),
+    ]) + [
+        migrations.RunPython(set_baselines, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,10 @@
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import models, router, transaction
+from django.db.models import F, Max, Sum
+from django.utils import timezone
 from branches.models import Branch as BranchModel
+from branches.sharding import BranchShardQuerySet
+from .db import retry_on_locked
 
 # ------------------- Bakery Products -------------------
 class Bread(models.Model):
@@ -59,22 +64,311 @@ class Flour(models.Model):  # Renamed from WheatFlour
         return self.name
 
 
+# product_type value -> catalog model
+PRODUCT_MODELS = {
+    'bread': Bread,
+    'injera': Injera,
+    'flour': Flour,
+    'yeast': Yeast,
+    'enhancer': Enhancer,
+}
+PRODUCT_TYPES = {Model: product_type for product_type, Model in PRODUCT_MODELS.items()}
+
+PRODUCT_CHOICES = [
+    ('bread', 'Bread'),
+    ('injera', 'Injera'),
+    ('flour', 'Flour'),      # updated from Wheat Flour
+    ('yeast', 'Yeast'),
+    ('enhancer', 'Enhancer'),
+]
+
+
+# ------------------- Product Registry -------------------
+class Product(models.Model):
+    """
+    One row per catalog product of any type, kept in sync with the five product
+    models by bakery.signals. Inventory and StockTransaction point at it with a
+    real foreign key, so cross-type lookups, searches and valuations are single
+    indexed queries.
+    """
+    key = models.CharField(max_length=40, unique=True)  # "<product_type>:<object_id>"
+    product_type = models.CharField(max_length=20, choices=PRODUCT_CHOICES)
+    object_id = models.PositiveIntegerField()  # pk in the product's own table
+    name = models.CharField(max_length=100, db_index=True)
+    # selling price for bread/injera, cost per kg for raw materials
+    price = models.DecimalField(max_digits=8, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['product_type', 'name']
+        indexes = [
+            models.Index(fields=['product_type', 'name']),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.get_product_type_display()})"
+
+    @staticmethod
+    def key_for(product_type, object_id):
+        if not product_type or not object_id:
+            return None
+        return f"{product_type}:{object_id}"
+
+    @classmethod
+    def sync(cls, obj):
+        """Create or refresh the registry row of a Bread/Injera/Flour/Yeast/Enhancer."""
+        product_type = PRODUCT_TYPES[type(obj)]
+        price = getattr(obj, 'selling_price', None)
+        if price is None:
+            price = getattr(obj, 'cost_per_kg', 0)
+        cls.objects.update_or_create(
+            key=cls.key_for(product_type, obj.pk),
+            defaults=dict(product_type=product_type, object_id=obj.pk, name=obj.name, price=price),
+        )
+
+
 # ------------------- Inventory -------------------
+class InsufficientStock(ValidationError):
+    """Raised when a stock-out would take an inventory row below zero."""
+
+
 class Inventory(models.Model):
-    PRODUCT_CHOICES = [
-        ('bread', 'Bread'),
-        ('injera', 'Injera'),
-        ('flour', 'Flour'),      # updated from Wheat Flour
-        ('yeast', 'Yeast'),
-        ('enhancer', 'Enhancer'),
-    ]
+    PRODUCT_CHOICES = PRODUCT_CHOICES
 
     branch = models.ForeignKey(BranchModel, on_delete=models.CASCADE)
     product_type = models.CharField(max_length=20, choices=PRODUCT_CHOICES)
     product_id = models.PositiveIntegerField()
     product_name = models.CharField(max_length=100, blank=True)
+    catalog_product = models.ForeignKey(
+        Product, to_field='key', on_delete=models.SET_NULL, null=True, blank=True, editable=False
+    )
     quantity = models.FloatField(default=0)
+    # the stock the StockTransaction ledger does not account for: the opening
+    # balance plus every correction made by hand. None once that is unknown;
+    # reconcile_inventory compares quantity with baseline + ledger
+    baseline = models.FloatField(null=True, default=0, editable=False)
     last_updated = models.DateTimeField(auto_now=True)
 
+    objects = BranchShardQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['branch', 'product_type', 'product_id'],
+                name='unique_inventory_product',
+            ),
+        ]
+        indexes = [
+            # covers the guarded stock-out UPDATE and stock level reads
+            models.Index(
+                fields=['branch', 'product_type', 'product_id', 'quantity'],
+                name='inventory_stock_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.product_name} ({self.branch.name}) - {self.quantity}"
+
+    def save(self, *args, **kwargs):
+        self.catalog_product_id = Product.key_for(self.product_type, self.product_id)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'quantity' in update_fields:
+            self.baseline = self.baseline_after_save(kwargs.get('using'))
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'baseline'}
+        super().save(*args, **kwargs)
+
+    def baseline_after_save(self, using=None):
+        """
+        The baseline once this save has set quantity by hand: a new row's
+        quantity is all baseline, an edit moves it by the difference from the
+        stored quantity. Moving a row to another product leaves it unknown.
+        """
+        if self._state.adding or self.pk is None:
+            return self.quantity
+        previous = (
+            Inventory.objects.using(using or self._state.db).filter(pk=self.pk)
+            .values_list('branch_id', 'product_type', 'product_id', 'quantity', 'baseline').first()
+        )
+        if previous is None:
+            return self.quantity
+        *key, quantity, baseline = previous
+        if baseline is None or key != [self.branch_id, self.product_type, self.product_id]:
+            return None
+        return baseline + (self.quantity - quantity)
+
+    @classmethod
+    def apply_delta(cls, branch, product_type, product_id, delta, product_name=''):
+        """
+        Add ``delta`` (negative for stock-out) to the matching inventory row.
+
+        The change is a single ``UPDATE ... SET quantity = quantity + delta`` so
+        concurrent postings never overwrite each other. The row is created on
+        first use. Call inside a transaction to keep it atomic with the ledger.
+        """
+        key = dict(branch=branch, product_type=product_type, product_id=product_id)
+        updates = dict(quantity=F('quantity') + delta, last_updated=timezone.now())
+        if product_name:
+            updates['product_name'] = product_name
+
+        if cls.objects.filter(**key).update(**updates):
+            return
+        inventory, _ = cls.objects.get_or_create(
+            **key, defaults={'product_name': product_name, 'quantity': 0}
+        )
+        cls.objects.filter(pk=inventory.pk).update(**updates)
+
+    @classmethod
+    @retry_on_locked(using=lambda cls, *args, **kwargs: router.db_for_write(cls))
+    def remove_stock(cls, branch, product_type, product_id, quantity):
+        """
+        Take ``quantity`` out of stock if, and only if, enough is available.
+
+        Runs one guarded ``UPDATE ... SET quantity = quantity - q WHERE
+        quantity >= q`` and reports success from the affected row count, so
+        two concurrent stock-outs can never both pass and oversell. Retried
+        if the write lock stays busy, unless called inside a transaction.
+        """
+        return cls.objects.filter(
+            branch=branch,
+            product_type=product_type,
+            product_id=product_id,
+            quantity__gte=quantity,
+        ).update(
+            quantity=F('quantity') - quantity,
+            last_updated=timezone.now(),
+        ) > 0
+
+    @classmethod
+    def insufficient_stock_error(cls, branch, product_type, product_id, quantity, product_name=''):
+        """Build the error for a failed :meth:`remove_stock` call."""
+        available = cls.objects.filter(
+            branch=branch, product_type=product_type, product_id=product_id
+        ).values_list('quantity', flat=True).first()
+        if available is None:
+            return InsufficientStock(
+                f"❌ No inventory record found for {product_name} in {branch}."
+            )
+        return InsufficientStock(
+            f"❌ Not enough stock of {product_name} in {branch}. "
+            f"Available: {available}, requested: {quantity}."
+        )
+
+
+# ------------------- Inventory snapshots -------------------
+class InventorySnapshot(models.Model):
+    """
+    A branch's inventory as it stood at ``created_at``: one row per product,
+    all rows of one snapshot sharing the timestamp. Written by :meth:`take`
+    (``manage.py snapshot_inventory``) so that :meth:`stock_as_of` only has to
+    replay the StockTransactions made after the nearest snapshot.
+    """
+    branch = models.ForeignKey(BranchModel, on_delete=models.CASCADE)
+    product_type = models.CharField(max_length=20, choices=PRODUCT_CHOICES)
+    product_id = models.PositiveIntegerField()
+    product_name = models.CharField(max_length=100, blank=True)
+    quantity = models.FloatField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # one product's snapshots over time
+            models.Index(
+                fields=['branch', 'product_type', 'product_id', 'created_at'],
+                name='invsnapshot_product_time_idx',
+            ),
+            # the latest snapshot of a branch
+            models.Index(fields=['branch', 'created_at'], name='invsnapshot_branch_time_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_name} ({self.branch.name}) - {self.quantity} @ {self.created_at:%Y-%m-%d %H:%M}"
+
+    @classmethod
+    def take(cls, branch=None, using=None):
+        """
+        Snapshot the current Inventory of ``branch`` (of every branch in the
+        database when None). Returns the number of rows written.
+        """
+        using = using or router.db_for_write(cls)
+        with transaction.atomic(using=using):
+            # taken after BEGIN IMMEDIATE holds the write lock: every stock
+            # posting stamped before this moment is already in Inventory
+            now = timezone.now()
+            rows = Inventory.objects.using(using).order_by()
+            if branch:
+                rows = rows.filter(branch=branch)
+            snapshots = [
+                cls(created_at=now, **row)
+                for row in rows.values('branch_id', 'product_type', 'product_id', 'product_name', 'quantity')
+            ]
+            cls.objects.using(using).bulk_create(snapshots, batch_size=500)
+        return len(snapshots)
+
+    @classmethod
+    def stock_as_of(cls, branch, at, product_type=None, product_id=None):
+        """
+        Stock of ``branch`` at the datetime ``at`` as {(product_type, product_id): quantity}:
+        the latest snapshot taken at or before ``at`` plus the StockTransactions
+        between the two. Manual Inventory edits made after that snapshot are
+        not in the ledger and so not replayed.
+        """
+        from branches.sharding import shard_for, use_shard
+        from StockTransaction.models import SIGNED_QUANTITY, StockTransaction
+
+        snapshots = cls.objects.filter(branch=branch, created_at__lte=at)
+        # rows without a product id never reached Inventory either
+        movements = StockTransaction.objects.filter(branch=branch, product_id__isnull=False, created_at__lte=at)
+        if product_type:
+            snapshots = snapshots.filter(product_type=product_type)
+            movements = movements.filter(product_type=product_type)
+        if product_id:
+            snapshots = snapshots.filter(product_id=product_id)
+            movements = movements.filter(product_id=product_id)
+
+        stock = {}
+        with use_shard(shard_for(branch)):
+            taken_at = snapshots.aggregate(taken_at=Max('created_at'))['taken_at']
+            if taken_at:
+                for key_type, key_id, quantity in snapshots.filter(created_at=taken_at).values_list(
+                        'product_type', 'product_id', 'quantity'):
+                    stock[key_type, key_id] = quantity
+                movements = movements.filter(created_at__gt=taken_at)
+            deltas = (
+                movements.order_by().values('product_type', 'product_id')
+                .annotate(delta=Sum(SIGNED_QUANTITY))
+                .values_list('product_type', 'product_id', 'delta')
+            )
+            for key_type, key_id, delta in deltas:
+                stock[key_type, key_id] = stock.get((key_type, key_id), 0) + delta
+        return stock
+
+
+# ------------------- Reconciliation checkpoint -------------------
+class InventoryCheckpoint(models.Model):
+    """
+    Ledger balance of every branch/product over StockTransactions up to
+    ``through_id``, as computed by the last ``manage.py reconcile_inventory``
+    run (all rows of a database share ``through_id``, ``ledger_rows`` and
+    ``checked_at``). The next run only sums the rows after it, unless rows up
+    to ``through_id`` were edited since ``checked_at`` or deleted (fewer than
+    ``ledger_rows`` left); then it sums the whole ledger again.
+    """
+    branch = models.ForeignKey(BranchModel, on_delete=models.CASCADE)
+    product_type = models.CharField(max_length=20, choices=PRODUCT_CHOICES)
+    product_id = models.PositiveIntegerField()
+    quantity = models.FloatField()
+    through_id = models.PositiveBigIntegerField()
+    # ledger rows with ids up to through_id, to notice deletions
+    ledger_rows = models.PositiveBigIntegerField(default=0)
+    checked_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['branch', 'product_type', 'product_id'],
+                name='unique_inventory_checkpoint',
+            ),
+        ]
+
     def __str__(self):
-        return f"{self.product_name} ({self.branch.name}) - {self.quantity}"
\ No newline at end of file
+        return f"{self.product_type}:{self.product_id} @ branch {self.branch_id} = {self.quantity}"
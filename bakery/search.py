@@ -0,0 +1,114 @@
+# bakery/search.py
+"""
+SQLite FTS5 search over the ledgers.
+
+Each searchable table ``<db_table>`` has a ``<db_table>_fts`` FTS5 table whose
+rowid is the ledger row's id (created in bakery migration 0017, reshaped in
+0020). SQLite triggers keep it in step, so bulk_create postings and F()
+updates are indexed as well as admin saves. The branch column holds a token
+of the branch id (branch_token), which queries match against the cached
+branch names. On other databases everything falls back to the admin's usual
+LIKE search.
+"""
+import re
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models.expressions import RawSQL
+
+from branches.sharding import fan_out
+from .filters import branch_choices
+
+# db_table -> indexed columns, as created by the migration
+SEARCH_COLUMNS = {
+    'bakery_inventory': ('product_name', 'product_type', 'branch'),
+    'StockTransaction_stocktransaction': ('product_name', 'product_type', 'transaction_type', 'branch'),
+    'finance_transaction': ('product_name', 'product_type', 'transaction_type', 'branch', 'reference'),
+}
+SEARCH_LIMIT = 50
+
+
+def fts_table(model):
+    return f"{model._meta.db_table}_fts"
+
+
+def is_searchable(model, using):
+    return model._meta.db_table in SEARCH_COLUMNS and connections[using].vendor == 'sqlite'
+
+
+def branch_token(branch_id):
+    """How a row's branch is indexed (see bakery migration 0020)."""
+    return f"b{branch_id}"
+
+
+def branch_tokens(word):
+    """Tokens of the branches with a word of their name or city starting with ``word``."""
+    word = word.lower()
+    return [
+        branch_token(pk) for pk, label in branch_choices()
+        if any(part.startswith(word) for part in re.findall(r'\w+', label.lower()))
+    ]
+
+
+def match_expression(term):
+    """
+    FTS5 query for free text: every word must match as a word prefix, so
+    "whi bre" finds "White Bread", and "whi pia" the White Bread of the
+    Piassa branch. Quotes keep FTS5 syntax out of user input.
+    """
+    words = []
+    for word in term.split():
+        quoted = word.replace('"', '""')
+        matches = [f'- branch : "{quoted}"*'] + [f'branch : "{token}"' for token in branch_tokens(word)]
+        words.append(f"({' OR '.join(matches)})")
+    return " AND ".join(words)
+
+
+def search_queryset(queryset, term):
+    """Filter ``queryset`` to rows whose index entry matches ``term``; None if unsupported."""
+    expression = match_expression(term)
+    if not expression or not is_searchable(queryset.model, queryset.db):
+        return None
+    table = fts_table(queryset.model)
+    return queryset.filter(pk__in=RawSQL(f'SELECT rowid FROM "{table}" WHERE "{table}" MATCH %s', [expression]))
+
+
+def search_rows(model, term, limit=SEARCH_LIMIT):
+    """
+    Best matches first, as dicts of the indexed columns plus ``id`` and the
+    ``database`` holding the row. Every branch database is searched
+    (branches.sharding); each ranks by its own index statistics, so the
+    order across databases is approximate.
+    """
+    expression = match_expression(term)
+    if not expression:
+        return []
+    table = fts_table(model)
+    columns = SEARCH_COLUMNS.get(model._meta.db_table, ())
+    select = ", ".join(f'"{column}"' for column in columns)
+
+    def search(using):
+        using = using or DEFAULT_DB_ALIAS
+        if not is_searchable(model, using):
+            return []
+        with connections[using].cursor() as cursor:
+            cursor.execute(
+                f'SELECT rank, rowid, {select} FROM "{table}" WHERE "{table}" MATCH %s ORDER BY rank LIMIT %s',
+                [expression, limit],
+            )
+            return [(rank, dict(zip(('id',) + columns, row), database=using)) for rank, *row in cursor.fetchall()]
+
+    matches = sorted((match for shard in fan_out(search) for match in shard), key=lambda match: match[0])
+    labels = {branch_token(pk): label for pk, label in branch_choices()}
+    rows = [row for _, row in matches[:limit]]
+    for row in rows:
+        row['branch'] = labels.get(row['branch'], row['branch'])
+    return rows
+
+
+class FullTextSearchMixin:
+    """Admin mixin: search_fields lookups go through the FTS5 index when available."""
+
+    def get_search_results(self, request, queryset, search_term):
+        results = search_queryset(queryset, search_term)
+        if results is None:
+            return super().get_search_results(request, queryset, search_term)
+        return results, False
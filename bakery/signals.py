@@ -0,0 +1,49 @@
+# bakery/signals.py
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from branches.models import Branch
+from .catalog import bump_catalog_version
+from .filters import add_facet_values, clear_branch_choices
+from .models import Bread, Enhancer, Flour, Injera, Inventory, Product, PRODUCT_TYPES, Yeast
+
+
+@receiver([post_save, post_delete], sender=Bread)
+@receiver([post_save, post_delete], sender=Injera)
+@receiver([post_save, post_delete], sender=Flour)
+@receiver([post_save, post_delete], sender=Yeast)
+@receiver([post_save, post_delete], sender=Enhancer)
+def invalidate_catalog(sender, **kwargs):
+    bump_catalog_version()
+
+
+# Keep the Product registry in step with the five product tables
+@receiver(post_save, sender=Bread)
+@receiver(post_save, sender=Injera)
+@receiver(post_save, sender=Flour)
+@receiver(post_save, sender=Yeast)
+@receiver(post_save, sender=Enhancer)
+def sync_product_registry(sender, instance, raw=False, **kwargs):
+    if not raw:
+        Product.sync(instance)
+
+
+@receiver(post_delete, sender=Bread)
+@receiver(post_delete, sender=Injera)
+@receiver(post_delete, sender=Flour)
+@receiver(post_delete, sender=Yeast)
+@receiver(post_delete, sender=Enhancer)
+def remove_from_product_registry(sender, instance, **kwargs):
+    Product.objects.filter(key=Product.key_for(PRODUCT_TYPES[sender], instance.pk)).delete()
+
+
+# Keep the cached admin sidebar filters current (see bakery.filters)
+@receiver(post_save, sender=Inventory)
+def add_inventory_facets(sender, instance, raw=False, **kwargs):
+    if not raw:
+        add_facet_values(sender, 'product_name', [instance.product_name])
+
+
+@receiver([post_save, post_delete], sender=Branch)
+def invalidate_branch_choices(sender, **kwargs):
+    clear_branch_choices()
@@ -28,16 +28,28 @@
         // ------------------- Existing AJAX for product choices -------------------
         var $productChoice = $('#id_product_choice');
 
+        // The whole catalog is fetched once per page in a single versioned payload;
+        // the browser revalidates it with its ETag, so an unchanged catalog is a 304.
+        var catalogRequest = null;
+
+        function loadCatalog() {
+            if (!catalogRequest) {
+                catalogRequest = $.getJSON('/bakery/get-products/', { product_type: 'all' })
+                    .fail(function() { catalogRequest = null; });
+            }
+            return catalogRequest;
+        }
+
         function loadProducts(productType, selectedId) {
             if (!productType) {
                 $productChoice.html('<option value="">---------</option>');
                 return;
             }
             $productChoice.html('<option value="">Loading...</option>');
-            $.getJSON('/bakery/get-products/', { product_type: productType })
+            loadCatalog()
                 .done(function(data) {
                     $productChoice.html('<option value="">---------</option>');
-                    $.each(data.products || [], function(_, p) {
+                    $.each((data.products || {})[productType] || [], function(_, p) {
                         $productChoice.append($('<option>', { value: p.id, text: p.name }));
                     });
                     if (selectedId) $productChoice.val(selectedId);
@@ -4,6 +4,25 @@ document.addEventListener("DOMContentLoaded", function () {
 
     if (!productTypeSelect || !productChoiceSelect) return;
 
+    // The whole catalog is fetched once per page in a single versioned payload;
+    // the browser revalidates it with its ETag, so an unchanged catalog is a 304.
+    let catalogRequest = null;
+
+    function loadCatalog() {
+        if (!catalogRequest) {
+            catalogRequest = fetch('/bakery/get-products/?product_type=all')
+                .then(resp => {
+                    if (!resp.ok) throw new Error(resp.status);
+                    return resp.json();
+                })
+                .catch(err => {
+                    catalogRequest = null;  // retry on the next change
+                    throw err;
+                });
+        }
+        return catalogRequest;
+    }
+
     function loadProducts(productType, selectedId) {
         if (!productType) {
             productChoiceSelect.innerHTML = '<option value="">---------</option>';
@@ -11,11 +30,10 @@ document.addEventListener("DOMContentLoaded", function () {
         }
 
         productChoiceSelect.innerHTML = '<option value="">Loading...</option>';
-        fetch('/bakery/get-products/?product_type=' + encodeURIComponent(productType))
-            .then(resp => resp.json())
+        loadCatalog()
             .then(data => {
                 productChoiceSelect.innerHTML = '<option value="">---------</option>';
-                (data.products || []).forEach(function (p) {
+                ((data.products || {})[productType] || []).forEach(function (p) {
                     const opt = document.createElement('option');
                     opt.value = p.id;
                     opt.textContent = p.name;
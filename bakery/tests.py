@@ -0,0 +1,260 @@
+from contextlib import ExitStack
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, connections
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from branches.models import Branch, UserBranch
+from StockTransaction.models import StockTransaction
+from .db import retry_on_locked
+from .models import Bread, Inventory
+from .search import search_queryset, search_rows
+
+
+class AdminQueryBudgetMixin:
+    """
+    Fixed query budgets for admin pages, checked as the table grows.
+
+    Subclasses must define add_rows(self, count), which grows their table to
+    ``count`` rows; assertPageBudget calls it before measuring each size.
+    Each page is fetched once to fill the caches (branch choices, changelist
+    counts) and then measured, so the budget is the steady state a user sees
+    while clicking around.
+    """
+    SIZES = (10, 100, 1000)
+
+    def setUp(self):
+        cache.clear()
+        self.admin_user = User.objects.create_superuser("budget", "budget@example.com", "budget")
+        self.client.force_login(self.admin_user)
+        self.branch = Branch.objects.create(name="Piassa", city="Addis Ababa")
+
+    def assertPageBudget(self, url, budget, branch_queries=None):
+        """
+        At every size the page at ``url`` (or url() if callable) takes
+        ``budget`` queries, summed over the test's databases, ``branch_queries``
+        of them reading branches_branch.
+        """
+        for size in self.SIZES:
+            with self.subTest(rows=size):
+                self.add_rows(size)
+                page = url() if callable(url) else url
+                self.assertEqual(self.client.get(page).status_code, 200)
+                with ExitStack() as stack:
+                    captures = [stack.enter_context(CaptureQueriesContext(connections[alias]))
+                                for alias in sorted(self.databases)]
+                    self.assertEqual(self.client.get(page).status_code, 200)
+                sql = [query['sql'] for capture in captures for query in capture.captured_queries]
+                self.assertEqual(len(sql), budget, "\n".join(sql))
+                if branch_queries is not None:
+                    self.assertEqual(len([q for q in sql if 'FROM "branches_branch"' in q]), branch_queries)
+
+
+def url_for(model, view, *args):
+    return reverse(f"admin:{model._meta.app_label}_{model._meta.model_name}_{view}", args=args)
+
+
+class InventoryAdminQueryTests(AdminQueryBudgetMixin, TestCase):
+    def add_rows(self, count):
+        start = Inventory.objects.count()
+        Inventory.objects.bulk_create(
+            Inventory(branch=self.branch, product_type='bread', product_id=pk,
+                      product_name=f"Bread {pk}", quantity=pk)
+            for pk in range(start + 1, count + 1)
+        )
+
+    def test_changelist(self):
+        self.assertPageBudget(url_for(Inventory, 'changelist'), 5)
+
+    def test_add_form(self):
+        self.assertPageBudget(url_for(Inventory, 'add'), 2, branch_queries=0)
+
+    def test_change_form(self):
+        self.assertPageBudget(lambda: url_for(Inventory, 'change', Inventory.objects.last().pk), 4, branch_queries=0)
+
+
+class UserAdminQueryTests(AdminQueryBudgetMixin, TestCase):
+    def add_rows(self, count):
+        start = User.objects.count()
+        users = User.objects.bulk_create(User(username=f"clerk{n}") for n in range(start, count))
+        UserBranch.objects.bulk_create(UserBranch(user=user, branch=self.branch) for user in users)
+
+    def test_changelist(self):
+        self.assertPageBudget(url_for(User, 'changelist'), 7)
+
+
+class BranchAdminQueryTests(AdminQueryBudgetMixin, TestCase):
+    def add_rows(self, count):
+        start = Branch.objects.count()
+        Branch.objects.bulk_create(
+            Branch(name=f"Branch {n}", city="Addis Ababa") for n in range(start, count)
+        )
+
+    def test_changelist(self):
+        self.assertPageBudget(url_for(Branch, 'changelist'), 6)
+
+
+class RetryOnLockedTests(SimpleTestCase):
+    def locked_once(self):
+        calls = []
+
+        def write(using):
+            calls.append(using)
+            if len(calls) == 1:
+                raise OperationalError("database is locked")
+            return using
+        return calls, retry_on_locked(write, delay=0, using=lambda using: using)
+
+    def test_retries_outside_a_transaction_on_the_alias_written(self):
+        calls, write = self.locked_once()
+        self.assertEqual(write('reporting'), 'reporting')
+        self.assertEqual(calls, ['reporting', 'reporting'])
+
+    def test_raises_inside_a_transaction_on_the_alias_written(self):
+        calls, write = self.locked_once()
+        with mock.patch.object(connections['reporting'], 'in_atomic_block', True):
+            with self.assertRaises(OperationalError):
+                write('reporting')
+        self.assertEqual(calls, ['reporting'])
+
+
+class LedgerSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.piassa = Branch.objects.create(name="Piassa", city="Addis Ababa")
+        self.bole = Branch.objects.create(name="Bole", city="Addis Ababa")
+        Inventory.objects.bulk_create(
+            Inventory(branch=branch, product_type=product_type, product_id=1, product_name=name)
+            for branch in (self.piassa, self.bole)
+            for product_type, name in (('bread', "White Bread"), ('injera', "Teff Injera"))
+        )
+
+    def search(self, term):
+        return sorted(
+            (row.branch.name, row.product_name)
+            for row in search_queryset(Inventory.objects.select_related('branch'), term)
+        )
+
+    def test_words_match_products_and_branches(self):
+        self.assertEqual(self.search("whi bre"), [("Bole", "White Bread"), ("Piassa", "White Bread")])
+        self.assertEqual(self.search("pia"), [("Piassa", "Teff Injera"), ("Piassa", "White Bread")])
+        self.assertEqual(self.search("whi pia"), [("Piassa", "White Bread")])
+        self.assertEqual(self.search("addis teff"), [("Bole", "Teff Injera"), ("Piassa", "Teff Injera")])
+
+    def test_renamed_branches_are_found_by_their_new_name(self):
+        self.bole.name = "Megenagna"
+        self.bole.save()
+        self.assertEqual(self.search("bole"), [])
+        self.assertEqual(self.search("mege whi"), [("Megenagna", "White Bread")])
+
+    def test_rows_name_their_branch(self):
+        rows = search_rows(Inventory, "pia whi")
+        self.assertEqual([(row['branch'], row['product_name']) for row in rows], [("Piassa (Addis Ababa)", "White Bread")])
+
+
+class ReconcileInventoryTests(TestCase):
+    def setUp(self):
+        self.branch = Branch.objects.create(name="Piassa", city="Addis Ababa")
+        self.white = self.stock(product_id=1, quantity=10)
+        self.stock(product_id=2, quantity=4)
+
+    def stock(self, product_id, quantity):
+        """A stock-in written without touching Inventory, as if Inventory had drifted."""
+        return StockTransaction.objects.bulk_create([StockTransaction(
+            branch=self.branch, product_type='bread', product_id=product_id, product_name=f"Bread {product_id}",
+            quantity=quantity, transaction_type='in',
+        )])[0]
+
+    def inventory(self, product_id, quantity):
+        Inventory.objects.bulk_create([Inventory(
+            branch=self.branch, product_type='bread', product_id=product_id, product_name=f"Bread {product_id}",
+            quantity=quantity,
+        )])
+
+    def reconcile(self, *args):
+        out = StringIO()
+        call_command('reconcile_inventory', *args, stdout=out)
+        return out.getvalue()
+
+    def quantities(self):
+        return dict(Inventory.objects.values_list('product_id', 'quantity'))
+
+    def test_repair_sets_inventory_to_the_ledger(self):
+        self.inventory(1, 7)
+        self.assertIn("2 drifted row(s) found", self.reconcile())
+        self.reconcile('--repair')
+        self.assertEqual(self.quantities(), {1: 10, 2: 4})
+        self.assertIn("0 drifted row(s) found", self.reconcile())
+
+    def opening_balance(self, quantity):
+        """A product stocked by hand in the admin, outside the ledger."""
+        bread = Bread.objects.create(
+            pk=100, name="Dabo", flour_kg=0.1, yeast_kg=0.01, enhancer_kg=0, water_birr=Decimal('0.50'),
+            electricity_birr=Decimal('0.50'), selling_price=Decimal('5.00'),
+        )
+        Inventory.objects.create(
+            branch=self.branch, product_type='bread', product_id=bread.pk, product_name=bread.name,
+            quantity=quantity,
+        )
+        return bread
+
+    def test_opening_balance_and_movements_are_not_drift(self):
+        self.inventory(1, 10)
+        self.inventory(2, 4)
+        bread = self.opening_balance(23)
+        StockTransaction(
+            branch=self.branch, product_type='bread', product_id=bread.pk, product_name=bread.name,
+            quantity=1, transaction_type='out',
+        ).save()
+
+        output = self.reconcile('--repair')
+        self.assertIn("0 drifted row(s)", output)
+        self.assertEqual(self.quantities()[bread.pk], 22)
+
+        # a correction by hand moves the baseline along with the quantity
+        row = Inventory.objects.get(product_id=bread.pk)
+        row.quantity = 20
+        row.save()
+        self.assertIn("0 drifted row(s)", self.reconcile())
+
+        Inventory.objects.filter(pk=row.pk).update(quantity=25)
+        self.assertIn(f"bread:{bread.pk}: inventory 25, baseline 21 + ledger -1", self.reconcile('--repair'))
+        self.assertEqual(self.quantities()[bread.pk], 20)
+
+    def test_rows_with_an_unknown_baseline_are_not_repaired(self):
+        self.inventory(1, 7)
+        Inventory.objects.filter(product_id=1).update(baseline=None)
+
+        output = self.reconcile('--repair')
+        self.assertIn("1 drifted row(s) repaired", output)  # product 2's missing row
+        self.assertIn("1 inventory row(s) have an unknown baseline", output)
+        self.assertEqual(self.quantities()[1], 7)
+
+        self.assertIn("1 inventory row(s) with an unknown baseline adopted", self.reconcile('--adopt'))
+        self.assertEqual(Inventory.objects.get(product_id=1).baseline, -3)
+        output = self.reconcile()
+        self.assertIn("0 drifted row(s)", output)
+        self.assertNotIn("unknown baseline", output)
+
+    def test_catch_up_sees_moved_and_deleted_movements(self):
+        self.inventory(1, 10)
+        self.inventory(2, 4)
+        self.reconcile()
+
+        # moved from product 1 to product 2 after the checkpoint
+        self.white.product_id = 2
+        self.white.save()
+        self.assertEqual(self.quantities(), {1: 0, 2: 14})
+        self.assertIn("0 drifted row(s) found", self.reconcile())
+
+        # deleted without giving its stock back
+        StockTransaction.objects.filter(pk=self.white.pk).delete()
+        output = self.reconcile()
+        self.assertIn("1 drifted row(s) found", output)
+        self.assertIn("bread:2: inventory 14, baseline 0 + ledger 4", output)
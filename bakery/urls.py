@@ -5,4 +5,6 @@ from . import views
 urlpatterns = [
     # other bakery urls...
     path("get-products/", views.get_products, name="get_products"),
+    path("search/", views.search, name="search"),
+    path("stock-as-of/", views.stock_as_of, name="stock_as_of"),
 ]
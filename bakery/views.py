@@ -1,23 +1,99 @@
+from django.apps import apps
+from django.contrib.admin.views.decorators import staff_member_required
 from django.shortcuts import render
 from django.http import JsonResponse
-from django.views.decorators.http import require_GET
-from .models import Bread, Injera, Flour, Yeast, Enhancer
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.http import condition, require_GET
+from branches.models import Branch
+from .catalog import catalog_version, get_catalog
+from .models import InventorySnapshot, Product
+from .search import SEARCH_LIMIT, search_rows
 
 def home(request):
     return render(request, "home.html")
 
+
+def _catalog_etag(request):
+    return f"{catalog_version()['version']}-{request.GET.get('product_type', '')}"
+
+
+def _catalog_last_modified(request):
+    return catalog_version()['modified']
+
+
 @require_GET
+@condition(etag_func=_catalog_etag, last_modified_func=_catalog_last_modified)
 def get_products(request):
+    """
+    Products of one type (?product_type=bread), or of every type
+    (?product_type=all) in one versioned payload. Unchanged catalogs are
+    answered with 304 from the cached version alone.
+    """
     product_type = request.GET.get("product_type")
-    products = []
-    if product_type == "bread":
-        products = list(Bread.objects.values("id", "name"))
-    elif product_type == "injera":
-        products = list(Injera.objects.values("id", "name"))
-    elif product_type == "flour":
-        products = list(Flour.objects.values("id", "name"))
-    elif product_type == "yeast":
-        products = list(Yeast.objects.values("id", "name"))
-    elif product_type == "enhancer":
-        products = list(Enhancer.objects.values("id", "name"))
-    return JsonResponse({"products": products})
+    catalog = get_catalog()
+    if product_type == "all":
+        payload = {"version": catalog_version()["version"], "products": catalog}
+    else:
+        payload = {"products": catalog.get(product_type, [])}
+    response = JsonResponse(payload)
+    # let the browser keep it, but revalidate (ETag) on every use
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+SEARCH_MODELS = {
+    "inventory": "bakery.Inventory",
+    "stock": "StockTransaction.StockTransaction",
+    "transaction": "finance.Transaction",
+}
+
+
+@require_GET
+@staff_member_required
+def search(request):
+    """
+    Full-text search over the ledgers: ?q=white bread[&kind=stock][&limit=20].
+    Best matches first, per kind; see bakery.search for the query syntax.
+    """
+    term = request.GET.get("q", "")
+    kinds = [request.GET["kind"]] if request.GET.get("kind") in SEARCH_MODELS else list(SEARCH_MODELS)
+    try:
+        limit = min(int(request.GET.get("limit", SEARCH_LIMIT)), SEARCH_LIMIT)
+    except ValueError:
+        limit = SEARCH_LIMIT
+    results = {kind: search_rows(apps.get_model(SEARCH_MODELS[kind]), term, limit) for kind in kinds}
+    return JsonResponse({"query": term, "results": results})
+
+
+@require_GET
+@staff_member_required
+def stock_as_of(request):
+    """
+    A branch's stock at a past moment: ?branch=1&at=2026-10-16T18:00[&product_type=bread[&product_id=3]].
+    Read from the nearest inventory snapshot plus the stock movements after it.
+    """
+    at = parse_datetime(request.GET.get("at", ""))
+    branch_id = request.GET.get("branch", "")
+    branch = Branch.objects.filter(pk=branch_id).first() if branch_id.isdigit() else None
+    product_id = request.GET.get("product_id", "")
+    if at is None or branch is None or (product_id and not product_id.isdigit()):
+        return JsonResponse({"errors": "Give a branch id, an ISO 'at' datetime and optionally a numeric product_id."},
+                            status=400)
+    if timezone.is_naive(at):
+        at = timezone.make_aware(at)
+
+    stock = InventorySnapshot.stock_as_of(
+        branch, at, product_type=request.GET.get("product_type"), product_id=int(product_id or 0) or None
+    )
+    names = dict(Product.objects.filter(key__in=[Product.key_for(*key) for key in stock]).values_list("key", "name"))
+    return JsonResponse({
+        "branch": branch.pk,
+        "at": at.isoformat(),
+        "stock": [
+            {"product_type": product_type, "product_id": product_id,
+             "product_name": names.get(Product.key_for(product_type, product_id), ""), "quantity": quantity}
+            for (product_type, product_id), quantity in sorted(stock.items(), key=lambda item: item[0])
+        ],
+    })
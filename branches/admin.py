@@ -26,6 +26,7 @@ class CustomUserAdmin(UserAdmin):
 
     # add branch column to the existing user list_display
     list_display = UserAdmin.list_display + ("branch",)
+    list_select_related = ("branch_assignment__branch",)
 
 # Re-register User with our custom admin ONLY if not already replaced
 try:
@@ -0,0 +1,74 @@
+# branches/management/commands/init_branch_shards.py
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from bakery.models import Inventory, InventoryCheckpoint, InventorySnapshot, Product
+from branches.models import Branch
+from branches.sharding import shard_aliases, shards_enabled
+from finance.models import FinanceDailyRollup, FinanceOutbox, Transaction
+from StockTransaction.models import StockTransaction
+
+COPY_BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = (
+        "Set up the per-branch databases named in BRANCH_SHARDS: migrate them, copy "
+        "branches and products into them and move each branch's ledgers out of 'default'. "
+        "Safe to run again after adding a branch to BRANCH_SHARDS."
+    )
+
+    def handle(self, *args, **options):
+        if not shards_enabled():
+            raise CommandError("BRANCH_SHARDS is empty; there is nothing to set up.")
+
+        for alias in shard_aliases()[1:]:
+            if alias not in connections.databases:
+                raise CommandError(f"BRANCH_SHARDS names '{alias}', which is not in DATABASES.")
+            call_command('migrate', database=alias, interactive=False, verbosity=0)
+            for model in (Branch, Product):
+                self.copy(model._base_manager.all(), alias, update=True)
+            self.stdout.write(f"{alias}: migrated, catalog copied.")
+
+        for branch_id, alias in settings.BRANCH_SHARDS.items():
+            if alias != DEFAULT_DB_ALIAS:
+                moved = self.move_branch(branch_id, alias)
+                self.stdout.write(f"Branch {branch_id}: moved {moved} row(s) to {alias}.")
+
+    def move_branch(self, branch_id, alias):
+        """Copy the branch's ledger rows into ``alias``, then delete them from 'default'."""
+        inventory = Inventory.objects.using(DEFAULT_DB_ALIAS).filter(branch_id=branch_id)
+        snapshots = InventorySnapshot.objects.using(DEFAULT_DB_ALIAS).filter(branch_id=branch_id)
+        checkpoint = InventoryCheckpoint.objects.using(DEFAULT_DB_ALIAS).filter(branch_id=branch_id)
+        stock = StockTransaction.objects.using(DEFAULT_DB_ALIAS).filter(branch_id=branch_id)
+        outbox = FinanceOutbox.objects.using(DEFAULT_DB_ALIAS).filter(stock_transaction__branch_id=branch_id)
+        ledger = Transaction.objects.using(DEFAULT_DB_ALIAS).filter(branch_id=branch_id)
+        rollups = FinanceDailyRollup.objects.using(DEFAULT_DB_ALIAS).filter(branch_id=branch_id)
+
+        with transaction.atomic(using=alias), transaction.atomic(using=DEFAULT_DB_ALIAS):
+            moved = sum(self.copy(qs, alias) for qs in (inventory, snapshots, checkpoint, stock, outbox, ledger, rollups))
+            # Transaction deletes take themselves out of the rollups, so the
+            # rollup rows go after them; deleting stock cascades to the outbox
+            for qs in (ledger, rollups, stock, inventory, snapshots, checkpoint):
+                qs.delete()
+        return moved
+
+    def copy(self, queryset, alias, update=False):
+        """bulk_create the rows of ``queryset`` into ``alias`` (no save() or signals), keeping pks."""
+        model = queryset.model
+        options = {}
+        if update:
+            fields = [f.name for f in model._meta.concrete_fields if not f.primary_key]
+            options = dict(update_conflicts=True, unique_fields=[model._meta.pk.name], update_fields=fields)
+        copied, batch = 0, []
+        for row in queryset.order_by('pk').iterator(chunk_size=COPY_BATCH_SIZE):
+            batch.append(row)
+            if len(batch) == COPY_BATCH_SIZE:
+                model._base_manager.using(alias).bulk_create(batch, **options)
+                copied, batch = copied + len(batch), []
+        if batch:
+            model._base_manager.using(alias).bulk_create(batch, **options)
+            copied += len(batch)
+        return copied
@@ -0,0 +1,193 @@
+# branches/sharding.py
+"""
+Optional per-branch databases.
+
+With settings.BRANCH_SHARDS = {branch_id: alias, ...}, the branch-scoped
+ledgers (SHARDED_MODELS) of those branches live in their own SQLite file, so
+each branch has its own writer lock. Everything else (users, branches,
+products) stays in 'default'; Branch and Product rows are mirrored into every
+shard so the ledgers' foreign keys hold there too (see branches.signals).
+Branches without an entry keep using 'default'. An empty BRANCH_SHARDS (the
+default) turns all of this off.
+
+Rows are routed by their branch_id on save, and BranchShardQuerySet routes
+create()/get_or_create()/bulk_create() the same way; code that works on a
+branch without an instance at hand (Inventory.apply_delta etc.) runs inside
+use_shard(). Consolidated reports run once per database through fan_out().
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, models
+
+SHARDED_MODELS = {
+    'bakery.inventory',
+    'bakery.inventorycheckpoint',
+    'bakery.inventorysnapshot',
+    'StockTransaction.stocktransaction',
+    'finance.transaction',
+    'finance.financedailyrollup',
+    'finance.financeoutbox',
+}
+MIRRORED_MODELS = {'branches.branch', 'bakery.product'}
+
+_current = threading.local()
+
+
+def shards_enabled():
+    return bool(getattr(settings, 'BRANCH_SHARDS', None))
+
+
+def shard_for(branch):
+    """Database alias holding the ledgers of ``branch`` (a Branch or its id)."""
+    branch_id = getattr(branch, 'pk', branch)
+    if branch_id is None or not shards_enabled():
+        return DEFAULT_DB_ALIAS
+    return settings.BRANCH_SHARDS.get(int(branch_id), DEFAULT_DB_ALIAS)
+
+
+def shard_aliases():
+    """Every database holding branch data, 'default' first."""
+    shards = set(getattr(settings, 'BRANCH_SHARDS', {}).values()) - {DEFAULT_DB_ALIAS}
+    return [DEFAULT_DB_ALIAS] + sorted(shards)
+
+
+@contextmanager
+def use_shard(alias):
+    """Route sharded models used by this thread inside the block to ``alias``."""
+    previous = getattr(_current, 'alias', None)
+    _current.alias = alias
+    try:
+        yield
+    finally:
+        _current.alias = previous
+
+
+def fan_out(func, branch=None):
+    """
+    Call ``func(alias)`` for every database holding branch data, in parallel
+    threads, and return the results in shard_aliases() order; with ``branch``
+    only for that branch's database. Without shards it is just
+    ``[func(None)]``: ``queryset.using(None)`` leaves the choice to the
+    routers (so reports still read the reporting copy).
+    """
+    if not shards_enabled():
+        return [func(None)]
+    if branch:
+        return [func(shard_for(branch))]
+
+    def run(alias):
+        try:
+            return func(alias)
+        finally:
+            # each pool thread opened its own connection
+            connections[alias].close()
+
+    aliases = shard_aliases()
+    with ThreadPoolExecutor(max_workers=len(aliases)) as pool:
+        return list(pool.map(run, aliases))
+
+
+class BranchShardQuerySet(models.QuerySet):
+    """
+    QuerySet for SHARDED_MODELS whose create(), get_or_create(),
+    update_or_create() and bulk_create() write to the database of the rows'
+    branch. Django would otherwise pass them the alias picked without an
+    instance, i.e. 'default' outside use_shard(). An explicit using() wins.
+    """
+
+    def for_branch(self, values):
+        """This queryset on the database of the branch in ``values`` (branch or branch_id)."""
+        if self._db is not None or not shards_enabled():
+            return self
+        branch = values.get('branch', values.get('branch_id'))
+        return self.using(shard_for(branch)) if branch is not None else self
+
+    def create(self, **kwargs):
+        return super(BranchShardQuerySet, self.for_branch(kwargs)).create(**kwargs)
+
+    def get_or_create(self, defaults=None, **kwargs):
+        queryset = self.for_branch({**(defaults or {}), **kwargs})
+        return super(BranchShardQuerySet, queryset).get_or_create(defaults=defaults, **kwargs)
+
+    def update_or_create(self, defaults=None, create_defaults=None, **kwargs):
+        queryset = self.for_branch({**(create_defaults or defaults or {}), **kwargs})
+        return super(BranchShardQuerySet, queryset).update_or_create(
+            defaults=defaults, create_defaults=create_defaults, **kwargs
+        )
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        if self._db is not None or not shards_enabled():
+            return super().bulk_create(objs, *args, **kwargs)
+        by_alias = {}
+        for obj in objs:
+            by_alias.setdefault(shard_for(obj.branch_id), []).append(obj)
+        for alias, shard_objs in by_alias.items():
+            super(BranchShardQuerySet, self.using(alias)).bulk_create(shard_objs, *args, **kwargs)
+        return objs
+
+
+class BranchShardRouter:
+    """Sends SHARDED_MODELS to their branch's database."""
+
+    def shard(self, model, hints):
+        if model._meta.label_lower not in SHARDED_MODELS or not shards_enabled():
+            return None
+        instance = hints.get('instance')
+        if isinstance(instance, model) and getattr(instance, 'branch_id', None) is not None:
+            return shard_for(instance.branch_id)
+        return getattr(_current, 'alias', None)
+
+    def db_for_read(self, model, **hints):
+        return self.shard(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self.shard(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # mirrored rows (Branch, Product) are the same row in every database
+        labels = {obj1._meta.label_lower, obj2._meta.label_lower}
+        if shards_enabled() and labels & MIRRORED_MODELS:
+            return True
+        return None
+
+
+def mirror(instance):
+    """Copy a Branch or Product row into every shard."""
+    model = type(instance)
+    values = {
+        field.attname: getattr(instance, field.attname)
+        for field in model._meta.concrete_fields if not field.primary_key
+    }
+    for alias in shard_aliases()[1:]:
+        model._base_manager.using(alias).update_or_create(pk=instance.pk, defaults=values)
+
+
+def unmirror(instance):
+    for alias in shard_aliases()[1:]:
+        type(instance)._base_manager.using(alias).filter(pk=instance.pk).delete()
+
+
+def branch_from_request(request):
+    """Branch id selected in an admin changelist (or the changelist a change page came from)."""
+    from django.http import QueryDict
+    branch_id = request.GET.get('branch__id__exact')
+    if branch_id is None and '_changelist_filters' in request.GET:
+        branch_id = QueryDict(request.GET['_changelist_filters']).get('branch__id__exact')
+    return branch_id if branch_id and branch_id.isdigit() else None
+
+
+class BranchShardAdminMixin:
+    """
+    Admin mixin for SHARDED_MODELS: with shards on, the changelist reads the
+    database of the branch picked in the branch filter ('default' until one
+    is picked), and change pages opened from it follow along.
+    """
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        if shards_enabled():
+            queryset = queryset.using(shard_for(branch_from_request(request)))
+        return queryset
@@ -1,11 +1,28 @@
 # branches/signals.py
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
-from .models import UserBranch
+from .models import Branch, UserBranch
+from .sharding import mirror, shards_enabled, unmirror
 
 @receiver(post_save, sender=User)
 def ensure_userbranch(sender, instance, created, **kwargs):
     if created:
         # create an empty assignment row so admin inline exists
-        UserBranch.objects.create(user=instance, branch=None)
\ No newline at end of file
+        UserBranch.objects.create(user=instance, branch=None)
+
+# Per-branch databases (branches.sharding) need their own copy of the rows
+# the ledgers point at
+@receiver(post_save, sender=Branch)
+@receiver(post_save, sender='bakery.Product')
+def mirror_to_shards(sender, instance, raw=False, using=None, **kwargs):
+    if not raw and using == DEFAULT_DB_ALIAS and shards_enabled():
+        mirror(instance)
+
+
+@receiver(post_delete, sender=Branch)
+@receiver(post_delete, sender='bakery.Product')
+def unmirror_from_shards(sender, instance, using=None, **kwargs):
+    if using == DEFAULT_DB_ALIAS and shards_enabled():
+        unmirror(instance)
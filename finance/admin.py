@@ -1,12 +1,17 @@
 from django.contrib import admin
-from django.http import HttpResponse
 from django.urls import path
-import csv
-from .models import Transaction
+from django.utils import timezone
+from bakery.changelists import KeysetPaginationMixin
+from bakery.db import reporting_reads
+from bakery.exports import CSVExportMixin
+from bakery.filters import BranchFilter, ProductNameFilter, ProductTypeFilter
+from bakery.search import FullTextSearchMixin
+from branches.sharding import BranchShardAdminMixin
+from .models import FinanceOutbox, Transaction
 from . import views
 
 @admin.register(Transaction)
-class TransactionAdmin(admin.ModelAdmin):
+class TransactionAdmin(BranchShardAdminMixin, FullTextSearchMixin, KeysetPaginationMixin, CSVExportMixin, admin.ModelAdmin):
     # Add product_type to list_display
     list_display = (
         "created_at",
@@ -18,15 +23,29 @@ class TransactionAdmin(admin.ModelAdmin):
         "total_amount"
     )
     
-    # Enable filtering by transaction_type and product_type
+    # Enable filtering by transaction_type, product_type and branch (which
+    # also picks the branch's database, see branches.sharding)
     list_filter = (
         "transaction_type",
-        "product_type",
-        "product_name",
+        BranchFilter,
+        ProductTypeFilter,
+        ProductNameFilter,
         "created_at"
     )
 
-    actions = ["export_as_csv"]
+    # Served from the full-text index on SQLite (bakery.search)
+    search_fields = ("product_name", "branch__name", "source_id")
+
+    csv_export_filename = "finance_report.csv"
+    csv_export_columns = (
+        ("Created At", "created_at"),
+        ("Transaction Type", "transaction_type"),
+        ("Product Type", "product_type"),
+        ("Product Name", "product_name"),
+        ("Quantity", "quantity"),
+        ("Unit Price", "unit_price"),
+        ("Total Amount", "total_amount"),
+    )
 
     # Custom admin URLs for graph only (PDF removed)
     def get_urls(self):
@@ -46,32 +65,24 @@ class TransactionAdmin(admin.ModelAdmin):
         extra_context["extra_buttons"] = [
             {"url": "report/graph/", "label": "📊 View Finance Graph"},
         ]
-        return super().changelist_view(request, extra_context=extra_context)
+        if request.method != "GET":
+            return super().changelist_view(request, extra_context=extra_context)
+        # browsing the ledger reads the reporting copy; actions (POST) use the primary
+        with reporting_reads():
+            return super().changelist_view(request, extra_context=extra_context)
+
+
+@admin.register(FinanceOutbox)
+class FinanceOutboxAdmin(admin.ModelAdmin):
+    list_display = ("stock_transaction", "status", "attempts", "created_at", "processed_at", "last_error")
+    list_select_related = ("stock_transaction__branch",)
+    list_filter = ("status",)
+    readonly_fields = ("stock_transaction", "created_at", "processed_at", "last_error")
+    actions = ["retry"]
 
-    # CSV Export Action
-    def export_as_csv(self, request, queryset):
-        response = HttpResponse(content_type="text/csv")
-        response["Content-Disposition"] = "attachment; filename=finance_report.csv"
-        writer = csv.writer(response)
-        writer.writerow([
-            "Created At",
-            "Transaction Type",
-            "Product Type",
-            "Product Name",
-            "Quantity",
-            "Unit Price",
-            "Total Amount"
-        ])
-        for obj in queryset:
-            writer.writerow([
-                obj.created_at,
-                obj.transaction_type,
-                obj.product_type,
-                obj.product_name,
-                obj.quantity,
-                obj.unit_price,
-                obj.total_amount
-            ])
-        return response
+    def retry(self, request, queryset):
+        queryset.exclude(status=FinanceOutbox.DONE).update(
+            status=FinanceOutbox.PENDING, attempts=0, available_at=timezone.now()
+        )
 
-    export_as_csv.short_description = "Export Selected as CSV"
\ No newline at end of file
+    retry.short_description = "Retry selected outbox rows"
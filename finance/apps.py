@@ -6,9 +6,6 @@ class FinanceConfig(AppConfig):
     name = 'finance'
 
     def ready(self):
-        # import signals (safe import)
-        try:
-            import finance.signals  # noqa
-        except Exception:
-            # if signals fail, we don't want to crash startup — log in real app
-            pass
\ No newline at end of file
+        # Finance postings depend on these receivers; if they cannot be
+        # imported, fail loudly instead of silently skipping revenue/expense.
+        import finance.signals  # noqa
\ No newline at end of file
@@ -0,0 +1,132 @@
+# finance/costs.py
+"""
+Per-product unit costs used when posting finance transactions.
+
+The whole table is small (one entry per catalog product), so it is built with
+one query per catalog model and kept in the cache until a Bread, Injera,
+Flour, Yeast or Enhancer row changes (see finance.signals). Posting a sale then
+needs no catalog queries at all.
+"""
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+from decimal import Decimal, InvalidOperation
+from django.apps import apps
+from django.core.cache import cache
+from django.db import transaction
+
+CACHE_KEY = 'finance:unit_costs'
+
+FINISHED_GOODS = ('bread', 'injera')
+RAW_MATERIALS = ('flour', 'yeast', 'enhancer')
+
+
+# Helper to safely turn numbers into Decimals
+def to_decimal(value):
+    try:
+        return Decimal(str(value))
+    except (InvalidOperation, TypeError, ValueError):
+        return Decimal('0.00')
+
+
+class UnitCost(namedtuple('UnitCost', [
+    'name', 'selling_price', 'raw_material_cost', 'water_cost', 'electricity_cost',
+])):
+    """Revenue and cost of one unit (or one kg, for raw materials) of a product."""
+
+    @property
+    def unit_cost(self):
+        return self.raw_material_cost + self.water_cost + self.electricity_cost
+
+
+ZERO_COST = UnitCost('', Decimal('0.00'), Decimal('0.00'), Decimal('0.00'), Decimal('0.00'))
+
+
+def build_unit_costs():
+    """
+    Compute the unit-cost table from the catalog.
+
+    Keys are ``(product_type, product_id)``; ``(product_type, None)`` holds the
+    first record of each raw material, which is what finished goods are costed
+    against.
+    """
+    table = {}
+    for product_type in RAW_MATERIALS:
+        Model = apps.get_model('bakery', product_type)
+        first = None
+        for pk, name, cost_per_kg in Model.objects.order_by('pk').values_list('pk', 'name', 'cost_per_kg'):
+            entry = ZERO_COST._replace(name=name, raw_material_cost=to_decimal(cost_per_kg))
+            table[(product_type, pk)] = entry
+            first = first or entry
+        table[(product_type, None)] = first or ZERO_COST
+
+    flour_cost = table[('flour', None)].raw_material_cost
+    yeast_cost = table[('yeast', None)].raw_material_cost
+    enhancer_cost = table[('enhancer', None)].raw_material_cost
+
+    for product_type in FINISHED_GOODS:
+        Model = apps.get_model('bakery', product_type)
+        for product in Model.objects.all():
+            raw = (
+                to_decimal(product.flour_kg) * flour_cost
+                + to_decimal(product.yeast_kg) * yeast_cost
+                + to_decimal(getattr(product, 'enhancer_kg', 0)) * enhancer_cost
+            )
+            table[(product_type, product.pk)] = UnitCost(
+                name=product.name,
+                selling_price=to_decimal(product.selling_price),
+                raw_material_cost=raw,
+                water_cost=to_decimal(product.water_birr),
+                electricity_cost=to_decimal(product.electricity_birr),
+            )
+    return table
+
+
+_pinned = threading.local()
+
+
+@contextmanager
+def pinned_unit_costs():
+    """
+    Use one cost table for the whole block instead of fetching it from the
+    cache on every lookup: bulk jobs get consistent prices and skip the
+    per-row cache round trip.
+    """
+    if getattr(_pinned, 'table', None) is not None:
+        yield
+        return
+    _pinned.table = get_unit_costs()
+    try:
+        yield
+    finally:
+        _pinned.table = None
+
+
+def get_unit_costs():
+    table = getattr(_pinned, 'table', None)
+    if table is not None:
+        return table
+    table = cache.get(CACHE_KEY)
+    if table is None:
+        table = build_unit_costs()
+        cache.set(CACHE_KEY, table, None)
+    return table
+
+
+def unit_cost_for(product_type, product_id):
+    """Return the UnitCost for a product, or None if it is not in the catalog."""
+    if not product_id:
+        return None
+    return get_unit_costs().get((product_type, int(product_id)))
+
+
+def first_unit_cost(product_type):
+    """UnitCost of the first record of a raw material (ZERO_COST if there is none)."""
+    return get_unit_costs().get((product_type, None), ZERO_COST)
+
+
+def invalidate_unit_costs():
+    # Drop now and again after commit, so a table rebuilt by another worker
+    # from pre-commit data does not outlive the change.
+    cache.delete(CACHE_KEY)
+    transaction.on_commit(lambda: cache.delete(CACHE_KEY))
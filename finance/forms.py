@@ -0,0 +1,28 @@
+# finance/forms.py
+from django import forms
+from bakery.models import PRODUCT_CHOICES
+from branches.models import Branch
+
+GRANULARITY_CHOICES = (
+    ('day', 'Day'),
+    ('week', 'Week'),
+    ('month', 'Month'),
+)
+
+PRODUCT_TYPE_CHOICES = [('', 'All products')] + PRODUCT_CHOICES
+
+
+class FinanceGraphForm(forms.Form):
+    granularity = forms.ChoiceField(choices=GRANULARITY_CHOICES, required=False, initial='day')
+    start = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+    end = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+    branch = forms.ModelChoiceField(queryset=Branch.objects.all(), required=False, empty_label="All branches")
+    product_type = forms.ChoiceField(choices=PRODUCT_TYPE_CHOICES, required=False)
+    product_name = forms.CharField(max_length=200, required=False)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start, end = cleaned_data.get('start'), cleaned_data.get('end')
+        if start and end and start > end:
+            raise forms.ValidationError("Start date must be before end date.")
+        return cleaned_data
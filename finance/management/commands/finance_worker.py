@@ -0,0 +1,90 @@
+# finance/management/commands/finance_worker.py
+import time
+from contextlib import nullcontext
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from bakery.db import is_locked_error, retry_on_locked
+from branches.sharding import shard_aliases
+from StockTransaction.models import StockTransaction
+from finance.models import FinanceOutbox
+from finance.posting import post_transactions, posting_batch, transactions_for_stock
+
+
+class Command(BaseCommand):
+    help = (
+        "Drain the finance outbox: post revenue/expense for queued stock transactions. "
+        "With per-branch databases every branch database has its own outbox."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200, help="Outbox rows per transaction.")
+        parser.add_argument('--interval', type=float, default=2.0, help="Seconds to sleep when the outbox is empty.")
+        parser.add_argument('--max-attempts', type=int, default=5, help="Attempts before a row is marked failed.")
+        parser.add_argument('--once', action='store_true', help="Drain what is pending now and exit.")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        while True:
+            counts = [self.drain_batch(batch_size, options['max_attempts'], using) for using in shard_aliases()]
+            if sum(counts):
+                self.stdout.write(f"Posted {sum(counts)} outbox row(s).")
+            if max(counts) < batch_size:
+                if options['once']:
+                    return
+                time.sleep(options['interval'])
+
+    @retry_on_locked(using=lambda command, batch_size, max_attempts, using: using)
+    def drain_batch(self, batch_size, max_attempts, using):
+        """Process one batch of ``using``'s outbox in one transaction; returns how many rows were handled."""
+        try:
+            return self.process_batch(batch_size, max_attempts, using, batched=True)
+        except Exception as exc:
+            if is_locked_error(exc):
+                raise
+            # the batch's one shared write failed and took every row with it:
+            # go again with each row writing its own postings, so only the
+            # rows at fault fail and get their attempts recorded
+            self.stderr.write(f"{using}: batched posting failed ({type(exc).__name__}: {exc}); posting row by row.")
+            return self.process_batch(batch_size, max_attempts, using, batched=False)
+
+    def process_batch(self, batch_size, max_attempts, using, batched):
+        now = timezone.now()
+        with transaction.atomic(using=using), (posting_batch(using) if batched else nullcontext()) as postings:
+            entries = list(
+                FinanceOutbox.objects.using(using).filter(status=FinanceOutbox.PENDING, available_at__lte=now)
+                .order_by('id')[:batch_size]
+            )
+            if not entries:
+                return 0
+            stocks = StockTransaction.objects.using(using).in_bulk([e.stock_transaction_id for e in entries])
+
+            done, failed = [], []
+            for entry in entries:
+                try:
+                    # savepoint per row: a failing row is rolled back on its own.
+                    # Batched, its postings are written with the others at the
+                    # end; otherwise as the savepoint closes.
+                    with postings.savepoint() if batched else posting_batch(using):
+                        post_transactions(transactions_for_stock(stocks[entry.stock_transaction_id]), using=using)
+                except Exception as exc:
+                    entry.attempts += 1
+                    entry.last_error = f"{type(exc).__name__}: {exc}"
+                    if entry.attempts >= max_attempts:
+                        entry.status = FinanceOutbox.FAILED
+                    else:
+                        # exponential backoff: 2, 4, 8, ... seconds
+                        entry.available_at = now + timedelta(seconds=2 ** entry.attempts)
+                    failed.append(entry)
+                else:
+                    entry.status = FinanceOutbox.DONE
+                    entry.processed_at = now
+                    done.append(entry)
+
+            FinanceOutbox.objects.using(using).bulk_update(done, ['status', 'processed_at'])
+            FinanceOutbox.objects.using(using).bulk_update(failed, ['status', 'attempts', 'last_error', 'available_at'])
+            if failed:
+                self.stderr.write(f"{len(failed)} outbox row(s) failed; see FinanceOutbox.last_error.")
+        return len(entries)
@@ -0,0 +1,147 @@
+# finance/management/commands/rebuild_finance.py
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.db.models import CharField, Max, Min
+from django.db.models.functions import Cast
+
+from bakery.filters import add_facet_values
+from branches.sharding import shard_aliases
+from finance.costs import pinned_unit_costs
+from finance.models import Transaction
+from finance.posting import BULK_BATCH_SIZE, transactions_for_stock
+from finance.rollups import rebuild_rollups
+from StockTransaction.models import StockTransaction
+
+SOURCE_APP = 'StockTransaction'
+SOURCE_KEY = ('source_app', 'source_id', 'transaction_type')
+# what --reprice overwrites on rows that already exist
+REPRICE_FIELDS = ('branch', 'product_type', 'product_name', 'quantity', 'unit_price', 'total_amount')
+FIELDS = [f for f in Transaction._meta.concrete_fields if not f.primary_key]
+
+
+def setup_worker():
+    import django
+    django.setup()
+
+
+def compute_chunk(using, first_id, last_id):
+    """
+    Finance rows for the stock movements with ids in [first_id, last_id],
+    dated like the movement they come from. Rows come back as tuples of
+    database values for FIELDS, so the writing process only runs SQL.
+    """
+    connection = connections[using]
+    rows, names = [], set()
+    stocks = StockTransaction.objects.using(using).filter(id__gte=first_id, id__lte=last_id).order_by()
+    with pinned_unit_costs():
+        for stock in stocks.iterator(chunk_size=BULK_BATCH_SIZE):
+            for txn in transactions_for_stock(stock):
+                txn.created_at = stock.created_at
+                rows.append(tuple(f.get_db_prep_save(getattr(txn, f.attname), connection) for f in FIELDS))
+                names.add(txn.product_name)
+    return rows, names
+
+
+def upsert_sql(connection, reprice):
+    """One-row INSERT of FIELDS that skips, or with ``reprice`` updates, rows already posted."""
+    qn = connection.ops.quote_name
+
+    def column(name):
+        return qn(Transaction._meta.get_field(name).column)
+
+    if reprice:
+        # rows whose values did not change are left alone (and not reindexed)
+        distinct = 'IS NOT' if connection.vendor == 'sqlite' else 'IS DISTINCT FROM'
+        action = (
+            'UPDATE SET ' + ', '.join(f'{column(name)} = EXCLUDED.{column(name)}' for name in REPRICE_FIELDS)
+            + ' WHERE ' + ' OR '.join(f'{column(name)} {distinct} EXCLUDED.{column(name)}' for name in REPRICE_FIELDS)
+        )
+    else:
+        action = 'NOTHING'
+    return (
+        f"INSERT INTO {qn(Transaction._meta.db_table)} ({', '.join(qn(f.column) for f in FIELDS)}) "
+        f"VALUES ({', '.join(['%s'] * len(FIELDS))}) "
+        f"ON CONFLICT ({', '.join(column(name) for name in SOURCE_KEY)}) DO {action}"
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Regenerate missing revenue/expense Transactions from the whole StockTransaction "
+        "ledger, in id chunks computed by a pool of worker processes, then rebuild the "
+        "daily rollups. Rows already posted are left alone unless --reprice is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000, help="Stock movements per chunk.")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help="Worker processes computing chunks (1: compute in this process).")
+        parser.add_argument('--reprice', action='store_true',
+                            help="Also overwrite existing rows with amounts at today's catalog costs.")
+        parser.add_argument('--prune', action='store_true',
+                            help="Delete rows whose stock movement no longer exists.")
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1 or options['workers'] < 1:
+            raise CommandError("--chunk-size and --workers must be at least 1.")
+        chunks = [chunk for using in shard_aliases() for chunk in self.chunks(using, options['chunk_size'])]
+        before = {using: self.posted(using) for using in shard_aliases()}
+
+        if options['workers'] == 1 or len(chunks) == 1:
+            for chunk in chunks:
+                self.write_chunk(chunk[0], compute_chunk(*chunk), options['reprice'])
+        else:
+            # forked workers must not inherit this process's open connections
+            connections.close_all()
+            pending = deque()
+            with ProcessPoolExecutor(max_workers=options['workers'], initializer=setup_worker) as pool:
+                for chunk in chunks:
+                    pending.append((chunk[0], pool.submit(compute_chunk, *chunk)))
+                    # at most two chunks per worker wait in memory to be written
+                    if len(pending) >= 2 * options['workers']:
+                        using, future = pending.popleft()
+                        self.write_chunk(using, future.result(), options['reprice'])
+                while pending:
+                    using, future = pending.popleft()
+                    self.write_chunk(using, future.result(), options['reprice'])
+
+        for using in shard_aliases():
+            pruned = self.prune(using) if options['prune'] else 0
+            rebuild_rollups(using=using)
+            added = self.posted(using) - before[using] + pruned
+            self.stdout.write(self.style.SUCCESS(
+                f"{using}: {added} row(s) added, {pruned} pruned; rollups rebuilt."
+            ))
+
+    def chunks(self, using, chunk_size):
+        """(using, first id, last id) ranges covering the ledger of ``using``."""
+        bounds = StockTransaction.objects.using(using).aggregate(first=Min('id'), last=Max('id'))
+        if bounds['first'] is None:
+            return []
+        return [
+            (using, start, min(start + chunk_size - 1, bounds['last']))
+            for start in range(bounds['first'], bounds['last'] + 1, chunk_size)
+        ]
+
+    def posted(self, using):
+        return Transaction.objects.using(using).filter(source_app=SOURCE_APP).count()
+
+    def write_chunk(self, using, chunk, reprice):
+        """Write one chunk's rows with a single executemany in one transaction."""
+        rows, names = chunk
+        if not rows:
+            return
+        with transaction.atomic(using=using), connections[using].cursor() as cursor:
+            cursor.executemany(upsert_sql(connections[using], reprice), rows)
+        add_facet_values(Transaction, 'product_name', names)
+
+    def prune(self, using):
+        stock_ids = StockTransaction.objects.using(using).annotate(
+            as_text=Cast('id', CharField())
+        ).values('as_text')
+        orphans = Transaction.objects.using(using).filter(source_app=SOURCE_APP).exclude(source_id__in=stock_ids)
+        deleted, _ = orphans.delete()
+        return deleted
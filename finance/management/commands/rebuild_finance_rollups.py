@@ -0,0 +1,23 @@
+# finance/management/commands/rebuild_finance_rollups.py
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+
+from branches.sharding import shard_aliases
+from finance.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily finance rollups from raw Transactions (backfill or repair)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help="Only rebuild days from this date (YYYY-MM-DD) onwards.")
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = date.fromisoformat(options['since'])
+            except ValueError:
+                raise CommandError("--since must be a date in YYYY-MM-DD format.")
+        written = sum(rebuild_rollups(since=since, using=using) for using in shard_aliases())
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} rollup row(s)."))
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:47
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('StockTransaction', '0003_alter_stocktransaction_quantity'),
+        ('finance', '0005_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FinanceOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('stock_transaction', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='StockTransaction.stocktransaction')),
+            ],
+            options={
+                'verbose_name_plural': 'finance outbox',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['status', 'available_at'], name='finance_fin_status_8fdc2c_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:47
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def backfill_rollups(apps, schema_editor):
+    db = schema_editor.connection.alias
+    Transaction = apps.get_model('finance', 'Transaction')
+    FinanceDailyRollup = apps.get_model('finance', 'FinanceDailyRollup')
+    grouped = (
+        Transaction.objects.using(db).order_by()
+        .annotate(day=TruncDate('created_at', tzinfo=timezone.get_current_timezone()))
+        .values('day', 'branch_id', 'product_type', 'product_name', 'transaction_type')
+        .annotate(qty=Sum('quantity'), amount=Sum('total_amount'), count=Count('pk'))
+    )
+    FinanceDailyRollup.objects.using(db).bulk_create(
+        [
+            FinanceDailyRollup(
+                day=row['day'],
+                branch_id=row['branch_id'],
+                product_type=row['product_type'],
+                product_name=row['product_name'] or '',
+                transaction_type=row['transaction_type'],
+                quantity=row['qty'] or 0.0,
+                total_amount=row['amount'] or Decimal('0.00'),
+                transaction_count=row['count'],
+            )
+            for row in grouped
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('branches', '0004_alter_userbranch_branch'),
+        ('finance', '0006_financeoutbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FinanceDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('product_type', models.CharField(max_length=50)),
+                ('product_name', models.CharField(blank=True, max_length=200)),
+                ('transaction_type', models.CharField(choices=[('revenue', 'Revenue'), ('expense', 'Expense')], max_length=10)),
+                ('quantity', models.FloatField(default=0.0)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=16)),
+                ('transaction_count', models.PositiveIntegerField(default=0)),
+                ('branch', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='branches.branch')),
+            ],
+            options={
+                'ordering': ['-day'],
+                'indexes': [models.Index(fields=['day', 'transaction_type'], name='finance_fin_day_1bf1be_idx')],
+                'constraints': [models.UniqueConstraint(fields=('day', 'branch', 'product_type', 'product_name', 'transaction_type'), name='unique_finance_daily_rollup')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
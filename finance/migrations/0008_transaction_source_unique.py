@@ -0,0 +1,67 @@
+# Generated by Django 5.2.6 on 2026-10-18 13:20
+
+from importlib import import_module
+
+from django.db import migrations, models
+from django.db.models import Min
+
+ledger_search = import_module('bakery.migrations.0017_ledger_search')
+rollups = import_module('finance.migrations.0007_financedailyrollup')
+TABLE = 'finance_transaction'
+
+
+def drop_duplicates(apps, schema_editor):
+    """Keep the first row per (source_app, source_id, transaction_type); blank keys become NULL."""
+    db = schema_editor.connection.alias
+    Transaction = apps.get_model('finance', 'Transaction')
+    FinanceDailyRollup = apps.get_model('finance', 'FinanceDailyRollup')
+    Transaction.objects.using(db).filter(source_app='').update(source_app=None)
+    Transaction.objects.using(db).filter(source_id='').update(source_id=None)
+
+    first = (
+        Transaction.objects.using(db).order_by()
+        .filter(source_app__isnull=False, source_id__isnull=False)
+        .values('source_app', 'source_id', 'transaction_type')
+        .annotate(first=Min('id'))
+        .values('first')
+    )
+    duplicates = Transaction.objects.using(db).filter(
+        source_app__isnull=False, source_id__isnull=False,
+    ).exclude(id__in=first)
+    if duplicates.exists():
+        duplicates.delete()
+        FinanceDailyRollup.objects.using(db).all().delete()
+        rollups.backfill_rollups(apps, schema_editor)
+
+
+# SQLite adds a unique constraint by rebuilding the table, which it refuses
+# to rename while the full-text triggers point at it (see StockTransaction 0007).
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in ledger_search.drop_sql(TABLE):
+            schema_editor.execute(sql)
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in ledger_search.index_sql(TABLE, ledger_search.INDEXES[TABLE]):
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bakery', '0019_inventory_checkpoint'),
+        ('branches', '0004_alter_userbranch_branch'),
+        ('finance', '0007_financedailyrollup'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicates, migrations.RunPython.noop),
+        migrations.RunPython(drop_search_index, create_search_index),
+        migrations.AddConstraint(
+            model_name='transaction',
+            constraint=models.UniqueConstraint(fields=('source_app', 'source_id', 'transaction_type'), name='finance_transaction_source_unique'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
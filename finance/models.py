@@ -33,6 +33,81 @@ class Transaction(models.Model):
             models.Index(fields=['transaction_type']),
             models.Index(fields=['created_at']),
         ]
+        constraints = [
+            # one revenue and one expense row per source (e.g. per stock
+            # movement); rows without a source (NULL) are not restricted
+            models.UniqueConstraint(
+                fields=['source_app', 'source_id', 'transaction_type'],
+                name='finance_transaction_source_unique',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.get_transaction_type_display()} - {self.product_name} - {self.total_amount}"
+
+
+class FinanceOutbox(models.Model):
+    """
+    Stock movement waiting for its finance postings.
+
+    Written in the same transaction as the StockTransaction when
+    settings.FINANCE_OUTBOX is on, and drained by ``manage.py finance_worker``.
+    """
+    PENDING = 'pending'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'Pending'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    )
+
+    stock_transaction = models.ForeignKey('StockTransaction.StockTransaction', on_delete=models.CASCADE)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    available_at = models.DateTimeField(default=timezone.now)  # retry backoff
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['id']
+        verbose_name_plural = 'finance outbox'
+        indexes = [
+            models.Index(fields=['status', 'available_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_status_display()} - stock #{self.stock_transaction_id}"
+
+
+class FinanceDailyRollup(models.Model):
+    """
+    Transactions summed per local day, branch, product and type.
+
+    Kept up to date as Transactions are posted (see finance.rollups) and
+    rebuilt from scratch with ``manage.py rebuild_finance_rollups``.
+    """
+    day = models.DateField()
+    branch = models.ForeignKey('branches.Branch', on_delete=models.CASCADE, null=True, blank=True)
+    product_type = models.CharField(max_length=50)
+    product_name = models.CharField(max_length=200, blank=True)
+    transaction_type = models.CharField(max_length=10, choices=Transaction.TRANSACTION_TYPE)
+    quantity = models.FloatField(default=0.0)
+    total_amount = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal('0.00'))
+    transaction_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-day']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['day', 'branch', 'product_type', 'product_name', 'transaction_type'],
+                name='unique_finance_daily_rollup',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['day', 'transaction_type']),
+        ]
 
     def __str__(self):
-        return f"{self.get_transaction_type_display()} - {self.product_name} - {self.total_amount}"
\ No newline at end of file
+        return f"{self.day} {self.get_transaction_type_display()} - {self.product_name} - {self.total_amount}"
\ No newline at end of file
@@ -0,0 +1,233 @@
+# finance/posting.py
+"""
+Turn stock movements into finance Transactions and write them in batches.
+
+``transactions_for_stock`` computes the (unsaved) revenue/expense rows for one
+StockTransaction. ``post_transactions`` writes them with one ``bulk_create``,
+or, inside a ``posting_batch()`` block, queues them so that a whole import of
+sales is written with a handful of statements.
+"""
+import threading
+from contextlib import contextmanager
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from bakery.filters import add_facet_values
+from .costs import FINISHED_GOODS, RAW_MATERIALS, ZERO_COST, first_unit_cost, to_decimal, unit_cost_for
+from .models import Transaction
+from .rollups import apply_to_rollups
+
+# Resolved once: only these keyword arguments (field names or attnames such as
+# branch_id) are passed on to Transaction.
+TRANSACTION_FIELDS = frozenset(
+    name for f in Transaction._meta.concrete_fields for name in (f.name, f.attname)
+)
+
+# Common synonyms for the stock direction
+OUT_SYNS = {'out', 'stock_out', 'sold', 'remove', 'minus'}
+IN_SYNS = {'in', 'stock_in', 'receive', 'added', 'plus'}
+
+BULK_BATCH_SIZE = 500
+
+
+def build_transaction(**kwargs):
+    """Unsaved Transaction built from the kwargs that are actual model fields."""
+    return Transaction(**{k: v for k, v in kwargs.items() if k in TRANSACTION_FIELDS})
+
+
+def transactions_for_stock(stock):
+    """
+    Compute the finance rows for one StockTransaction (stock-out of a finished
+    good, or stock-in of raw material). Nothing is saved.
+
+    Expected fields on StockTransaction (best-effort):
+     - product_type: 'bread'|'injera'|'flour'|'yeast'|'enhancer'
+     - product_id: int (pk of bakery product)
+     - product_name: str
+     - quantity: numeric
+     - transaction_type: 'in' or 'out' (case-insensitive)
+     - branch: optional FK
+    """
+    txn_dir = getattr(stock, 'transaction_type', '') or getattr(stock, 'type', '')
+    txn_dir = str(txn_dir).lower()
+
+    product_type = getattr(stock, 'product_type', None)
+    product_id = getattr(stock, 'product_id', None)
+    product_name = getattr(stock, 'product_name', None)
+    qty = to_decimal(getattr(stock, 'quantity', 0) or 0)
+    common = dict(
+        branch_id=getattr(stock, 'branch_id', None),
+        product_type=product_type,
+        quantity=float(qty),
+        source_app='StockTransaction',
+        source_id=str(getattr(stock, 'pk', '')),
+    )
+
+    # ---------- FINISHED GOODS (bread, injera) on STOCK-OUT ----------
+    if txn_dir in OUT_SYNS and product_type in FINISHED_GOODS:
+        # per-unit revenue and expense come precomputed from the cost table:
+        # per_unit = water_birr + electricity_birr
+        #          + flour_kg * flour.cost_per_kg
+        #          + yeast_kg * yeast.cost_per_kg
+        #          + enhancer_kg * enhancer.cost_per_kg
+        cost = unit_cost_for(product_type, product_id) or ZERO_COST
+        name = product_name or cost.name
+        return [
+            build_transaction(
+                product_name=name,
+                unit_price=cost.selling_price,
+                total_amount=cost.selling_price * qty,
+                transaction_type='revenue',
+                **common
+            ),
+            build_transaction(
+                product_name=name,
+                unit_price=cost.unit_cost,
+                total_amount=cost.unit_cost * qty,
+                transaction_type='expense',
+                **common
+            ),
+        ]
+
+    # ---------- RAW-MATERIAL STOCK-IN (expense) ----------
+    if txn_dir in IN_SYNS and product_type in RAW_MATERIALS:
+        # cost = qty * cost_per_kg of the material, falling back to the first record of its type
+        cost = unit_cost_for(product_type, product_id)
+        if cost is None:
+            cost = first_unit_cost(product_type) if product_id else ZERO_COST
+        return [
+            build_transaction(
+                product_name=product_name or cost.name,
+                unit_price=cost.unit_cost,
+                total_amount=cost.unit_cost * qty,
+                transaction_type='expense',
+                **common
+            ),
+        ]
+
+    return []
+
+
+# ------------------- Batching -------------------
+_local = threading.local()
+
+
+def _active_batches():
+    if not hasattr(_local, 'batches'):
+        _local.batches = {}
+    return _local.batches
+
+
+class PostingBatch:
+    """Finance rows queued inside one ``posting_batch()`` block."""
+
+    def __init__(self, using):
+        self.using = using
+        self.rows = []
+
+    def add(self, rows):
+        self.rows.extend(rows)
+
+    @contextmanager
+    def savepoint(self):
+        """
+        ``transaction.atomic()`` for one item of the batch (one sale, one
+        outbox row): if the savepoint rolls back, by an exception or by
+        ``set_rollback()``, the rows queued inside it are dropped too.
+        """
+        queued = len(self.rows)
+        rolled_back = True
+        try:
+            with transaction.atomic(using=self.using):
+                yield
+                rolled_back = transaction.get_rollback(using=self.using)
+        finally:
+            if rolled_back:
+                del self.rows[queued:]
+
+    def flush(self):
+        rows, self.rows = self.rows, []
+        return write_transactions(rows, self.using)
+
+
+@contextmanager
+def posting_batch(using=DEFAULT_DB_ALIAS):
+    """
+    Collect finance rows posted inside the block and write them with a single
+    bulk_create as the block exits, in the same transaction as the stock rows.
+
+    Work inside the block that may fail on its own and be rolled back while
+    the rest carries on runs in ``batch.savepoint()`` rather than a plain
+    ``transaction.atomic()``, so its queued rows are rolled back with it.
+    Nested blocks join the outermost one.
+    """
+    batches = _active_batches()
+    if using in batches:
+        yield batches[using]
+        return
+
+    with transaction.atomic(using=using):
+        batch = batches[using] = PostingBatch(using)
+        try:
+            yield batch
+            batch.flush()
+        finally:
+            del batches[using]
+
+
+def post_transactions(rows, using=DEFAULT_DB_ALIAS):
+    """Write (or, inside posting_batch(), queue) unsaved Transaction rows."""
+    rows = list(rows)
+    if not rows:
+        return rows
+    batch = _active_batches().get(using)
+    if batch is not None:
+        batch.add(rows)
+    else:
+        write_transactions(rows, using)
+    return rows
+
+
+def source_key(row):
+    return (row.source_app, row.source_id, row.transaction_type)
+
+
+def unposted(rows, using=DEFAULT_DB_ALIAS):
+    """
+    Drop rows whose source (e.g. a stock movement posted twice by a retried
+    outbox entry) already has its row of that type, or repeats one earlier
+    in ``rows``. Rows without a source are always kept.
+    """
+    sourced = {}
+    for row in rows:
+        if row.source_app and row.source_id:
+            sourced.setdefault(row.source_app, set()).add(row.source_id)
+    if not sourced:
+        return rows
+
+    seen = set()
+    for source_app, source_ids in sourced.items():
+        source_ids = sorted(source_ids)
+        for start in range(0, len(source_ids), BULK_BATCH_SIZE):
+            seen.update(
+                Transaction.objects.using(using)
+                .filter(source_app=source_app, source_id__in=source_ids[start:start + BULK_BATCH_SIZE])
+                .values_list('source_app', 'source_id', 'transaction_type')
+            )
+    fresh = []
+    for row in rows:
+        if row.source_app and row.source_id:
+            if source_key(row) in seen:
+                continue
+            seen.add(source_key(row))
+        fresh.append(row)
+    return fresh
+
+
+def write_transactions(rows, using=DEFAULT_DB_ALIAS):
+    """bulk_create the rows not posted yet and add them to the daily rollups."""
+    rows = unposted(rows, using)
+    if rows:
+        Transaction.objects.using(using).bulk_create(rows, batch_size=BULK_BATCH_SIZE)
+        apply_to_rollups(rows, using=using)
+        add_facet_values(Transaction, 'product_name', [row.product_name for row in rows])
+    return rows
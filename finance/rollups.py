@@ -0,0 +1,103 @@
+# finance/rollups.py
+"""
+Incremental maintenance of FinanceDailyRollup.
+
+Every posted Transaction adds its quantity and amount to the rollup row for
+(local day, branch, product_type, product_name, transaction_type). Reports read
+whole days from the rollups and only touch raw Transactions at the edges of a
+period (see finance.utils.aggregate_by_period).
+"""
+from collections import defaultdict
+from datetime import datetime, time
+from decimal import Decimal
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import FinanceDailyRollup, Transaction
+
+ROLLUP_KEY_FIELDS = ('day', 'branch_id', 'product_type', 'product_name', 'transaction_type')
+
+
+def rollup_key(txn):
+    return (
+        timezone.localdate(txn.created_at),
+        txn.branch_id,
+        txn.product_type,
+        txn.product_name or '',
+        txn.transaction_type,
+    )
+
+
+def apply_to_rollups(transactions, sign=1, using=DEFAULT_DB_ALIAS):
+    """Add (sign=1) or remove (sign=-1) Transactions from the daily rollups."""
+    deltas = defaultdict(lambda: [0.0, Decimal('0.00'), 0])
+    for txn in transactions:
+        delta = deltas[rollup_key(txn)]
+        delta[0] += float(txn.quantity or 0)
+        delta[1] += Decimal(txn.total_amount or 0)
+        delta[2] += 1
+
+    rollups = FinanceDailyRollup.objects.using(using)
+    for key, (quantity, amount, count) in deltas.items():
+        lookup = dict(zip(ROLLUP_KEY_FIELDS, key))
+        updates = dict(
+            quantity=F('quantity') + sign * quantity,
+            total_amount=F('total_amount') + sign * amount,
+            transaction_count=F('transaction_count') + sign * count,
+        )
+        if rollups.filter(**lookup).update(**updates):
+            continue
+        try:
+            with transaction.atomic(using=using):
+                rollups.create(quantity=sign * quantity, total_amount=sign * amount,
+                               transaction_count=sign * count, **lookup)
+        except IntegrityError:
+            # created concurrently by another posting; add to it instead
+            rollups.filter(**lookup).update(**updates)
+
+
+def rebuild_rollups(since=None, using=DEFAULT_DB_ALIAS):
+    """
+    Recompute rollups from raw Transactions with one grouped query.
+
+    With ``since`` (a date), only days from that date onwards are rebuilt.
+    Returns the number of rollup rows written.
+    """
+    rollups = FinanceDailyRollup.objects.using(using)
+    transactions = Transaction.objects.using(using).order_by()
+    if since is not None:
+        rollups = rollups.filter(day__gte=since)
+        transactions = transactions.filter(created_at__gte=day_start(since))
+
+    grouped = (
+        transactions
+        .annotate(day=TruncDate('created_at', tzinfo=timezone.get_current_timezone()))
+        .values('day', 'branch_id', 'product_type', 'product_name', 'transaction_type')
+        .annotate(qty=Sum('quantity'), amount=Sum('total_amount'), count=Count('pk'))
+    )
+    with transaction.atomic(using=using):
+        rollups.delete()
+        created = FinanceDailyRollup.objects.using(using).bulk_create(
+            (
+                FinanceDailyRollup(
+                    day=row['day'],
+                    branch_id=row['branch_id'],
+                    product_type=row['product_type'],
+                    product_name=row['product_name'] or '',
+                    transaction_type=row['transaction_type'],
+                    quantity=row['qty'] or 0.0,
+                    total_amount=row['amount'] or Decimal('0.00'),
+                    transaction_count=row['count'],
+                )
+                for row in grouped.iterator()
+            ),
+            batch_size=500,
+        )
+    return len(created)
+
+
+def day_start(day):
+    """Aware datetime of local midnight at the start of ``day``."""
+    return timezone.make_aware(datetime.combine(day, time.min))
@@ -0,0 +1,120 @@
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from bakery.models import Bread, Inventory
+from bakery.tests import AdminQueryBudgetMixin, url_for
+from branches.models import Branch
+from StockTransaction.models import StockTransaction
+from .models import FinanceOutbox, Transaction
+from .posting import posting_batch, transactions_for_stock
+
+
+class PostingTestCase(TestCase):
+    def setUp(self):
+        self.branch = Branch.objects.create(name="Piassa", city="Addis Ababa")
+        self.bread = Bread.objects.create(
+            name="White Bread", flour_kg=0.1, yeast_kg=0.01, enhancer_kg=0.0,
+            water_birr=Decimal('0.50'), electricity_birr=Decimal('0.50'), selling_price=Decimal('5.00'),
+        )
+        Inventory.objects.create(branch=self.branch, product_type='bread', product_id=self.bread.pk,
+                                 product_name=self.bread.name, quantity=100)
+
+    def sale(self, quantity=1):
+        return StockTransaction(
+            branch=self.branch, product_type='bread', product_id=self.bread.pk,
+            product_name=self.bread.name, quantity=quantity, transaction_type='out',
+        )
+
+
+class PostingBatchTests(PostingTestCase):
+    def test_rows_are_written_once_when_the_block_exits(self):
+        with posting_batch() as batch:
+            for _ in range(3):
+                with batch.savepoint():
+                    self.sale().save()
+            self.assertEqual(Transaction.objects.count(), 0)
+        self.assertEqual(Transaction.objects.filter(transaction_type='revenue').count(), 3)
+        self.assertEqual(Transaction.objects.filter(transaction_type='expense').count(), 3)
+
+    def test_rolled_back_savepoints_drop_their_rows(self):
+        with posting_batch() as batch:
+            with batch.savepoint():
+                self.sale().save()
+            with self.assertRaises(RuntimeError):
+                with batch.savepoint():
+                    self.sale().save()
+                    raise RuntimeError("till crashed")
+            with batch.savepoint():
+                self.sale().save()
+                transaction.set_rollback(True)
+        self.assertEqual(StockTransaction.objects.count(), 1)
+        self.assertEqual(
+            set(Transaction.objects.values_list('source_id', flat=True)),
+            {str(StockTransaction.objects.get().pk)},
+        )
+
+
+@override_settings(FINANCE_OUTBOX=True)
+class FinanceWorkerTests(PostingTestCase):
+    def test_a_row_breaking_the_batched_write_only_fails_itself(self):
+        sales = [self.sale() for _ in range(3)]
+        for sale in sales:
+            sale.save()
+        broken = sales[1]
+
+        def rows_for(stock):
+            rows = transactions_for_stock(stock)
+            if stock.pk == broken.pk:
+                for row in rows:
+                    row.created_at = None  # NOT NULL: fails only when written
+            return rows
+
+        stderr = StringIO()
+        with mock.patch('finance.management.commands.finance_worker.transactions_for_stock', rows_for):
+            call_command('finance_worker', once=True, stdout=StringIO(), stderr=stderr)
+
+        self.assertIn("posting row by row", stderr.getvalue())
+        outbox = {entry.stock_transaction_id: entry for entry in FinanceOutbox.objects.all()}
+        self.assertEqual(outbox[broken.pk].status, FinanceOutbox.PENDING)
+        self.assertEqual(outbox[broken.pk].attempts, 1)
+        self.assertIn("IntegrityError", outbox[broken.pk].last_error)
+        for sale in (sales[0], sales[2]):
+            self.assertEqual(outbox[sale.pk].status, FinanceOutbox.DONE)
+        self.assertEqual(
+            set(Transaction.objects.values_list('source_id', flat=True)),
+            {str(sales[0].pk), str(sales[2].pk)},
+        )
+
+
+class TransactionAdminQueryTests(AdminQueryBudgetMixin, TransactionTestCase):
+    # the changelist reads the reporting copy, a second connection to the test
+    # database, which only sees committed rows
+    databases = {'default', 'reporting'}
+
+    def add_rows(self, count):
+        Transaction.objects.bulk_create(
+            Transaction(branch=self.branch, product_type='bread', product_name="White Bread", quantity=1,
+                        unit_price=Decimal('5.00'), total_amount=Decimal('5.00'), transaction_type='revenue',
+                        source_app='budget', source_id=str(n))
+            for n in range(Transaction.objects.count(), count)
+        )
+
+    def test_changelist(self):
+        self.assertPageBudget(url_for(Transaction, 'changelist'), 3)
+
+
+class FinanceOutboxAdminQueryTests(AdminQueryBudgetMixin, TestCase):
+    def add_rows(self, count):
+        sales = StockTransaction.objects.bulk_create(
+            StockTransaction(branch=self.branch, product_type='bread', product_id=1,
+                             product_name="White Bread", quantity=1, transaction_type='out')
+            for _ in range(FinanceOutbox.objects.count(), count)
+        )
+        FinanceOutbox.objects.bulk_create(FinanceOutbox(stock_transaction=sale) for sale in sales)
+
+    def test_changelist(self):
+        self.assertPageBudget(url_for(FinanceOutbox, 'changelist'), 5)
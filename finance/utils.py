@@ -1,25 +1,67 @@
 # finance/utils.py
+from datetime import timedelta
 from django.db.models import Sum
-from .models import Transaction
+from django.utils import timezone
+from bakery.db import reporting_reads
+from branches.sharding import fan_out
+from .models import FinanceDailyRollup, Transaction
+from .rollups import day_start
 
+
+def _totals(qs, amount_field):
+    totals = {'revenue': 0, 'expense': 0}
+    for row in qs.order_by().values('transaction_type').annotate(total=Sum(amount_field)):
+        if row['transaction_type'] in totals:
+            totals[row['transaction_type']] = row['total'] or 0
+    return totals
+
+
+@reporting_reads()
 def aggregate_by_period(start=None, end=None, branch=None):
     """
     Returns a dict with totals for revenue, expense, and net between start and end datetimes.
     If start/end are None, use all available.
+
+    Whole local days inside the period are read from FinanceDailyRollup; raw
+    Transactions are only scanned for the partial days at either edge. With
+    per-branch databases every database is summed in parallel.
     """
-    qs = Transaction.objects.all()
+    # whole days are [first_day, end_day)
+    first_day = end_day = None
     if start:
-        qs = qs.filter(created_at__gte=start)
+        first_day = timezone.localdate(start)
+        if start > day_start(first_day):
+            first_day += timedelta(days=1)
     if end:
-        qs = qs.filter(created_at__lte=end)
-    if branch:
-        qs = qs.filter(branch=branch)
+        end_day = timezone.localdate(end)
+
+    def period_totals(using):
+        raw = Transaction.objects.using(using)
+        rollups = FinanceDailyRollup.objects.using(using)
+        if branch:
+            raw = raw.filter(branch=branch)
+            rollups = rollups.filter(branch=branch)
+
+        if first_day and end_day and first_day >= end_day:
+            # no whole day in the period: raw rows only
+            return [_totals(raw.filter(created_at__gte=start, created_at__lte=end), 'total_amount')]
+        if first_day:
+            rollups = rollups.filter(day__gte=first_day)
+        if end_day:
+            rollups = rollups.filter(day__lt=end_day)
+        parts = [_totals(rollups, 'total_amount')]
+        if start:
+            parts.append(_totals(raw.filter(created_at__gte=start, created_at__lt=day_start(first_day)), 'total_amount'))
+        if end:
+            parts.append(_totals(raw.filter(created_at__gte=day_start(end_day), created_at__lte=end), 'total_amount'))
+        return parts
 
-    revenue = qs.filter(transaction_type='revenue').aggregate(total=Sum('total_amount'))['total'] or 0
-    expense = qs.filter(transaction_type='expense').aggregate(total=Sum('total_amount'))['total'] or 0
+    parts = [part for shard in fan_out(period_totals, branch=branch) for part in shard]
+    revenue = sum(p['revenue'] for p in parts)
+    expense = sum(p['expense'] for p in parts)
     net = revenue - expense
     return {
         'revenue': revenue,
         'expense': expense,
         'net': net
-    }
\ No newline at end of file
+    }
@@ -1,24 +1,118 @@
 # finance/views.py
+from datetime import timedelta
+from decimal import Decimal
+from django.db.models import Q, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
 from django.shortcuts import render
-from django.http import HttpResponse
-from .models import Transaction
+from django.utils import timezone
+from bakery.db import reporting_reads
+from branches.sharding import fan_out
+from .forms import FinanceGraphForm
+from .models import FinanceDailyRollup
 import plotly.graph_objs as go
 import plotly.io as pio
 
+# Default look-back per granularity; keeps the number of buckets bounded
+DEFAULT_SPAN = {
+    'day': timedelta(days=30),
+    'week': timedelta(weeks=26),
+    'month': timedelta(days=365),
+}
+
+BUCKETS = {
+    'week': TruncWeek('day'),
+    'month': TruncMonth('day'),
+}
+
+
+def finance_series(granularity='day', start=None, end=None, branch=None, product_type=None, product_name=None):
+    """
+    Revenue, expense and net per period, grouped and summed in the database
+    from the daily rollups. Returns (periods, revenue, expense, net) lists.
+    """
+    period_field = 'period' if granularity in BUCKETS else 'day'
+
+    def period_sums(using):
+        qs = FinanceDailyRollup.objects.using(using)
+        if start:
+            qs = qs.filter(day__gte=start)
+        if end:
+            qs = qs.filter(day__lte=end)
+        if branch:
+            qs = qs.filter(branch=branch)
+        if product_type:
+            qs = qs.filter(product_type=product_type)
+        if product_name:
+            qs = qs.filter(product_name=product_name)
+        if granularity in BUCKETS:
+            qs = qs.annotate(period=BUCKETS[granularity])
+        return (
+            qs.order_by()
+            .values(period_field)
+            .annotate(
+                revenue=Sum('total_amount', filter=Q(transaction_type='revenue')),
+                expense=Sum('total_amount', filter=Q(transaction_type='expense')),
+            )
+            .order_by(period_field)
+        )
+
+    # one partial sum per branch database (see branches.sharding), merged here
+    totals = {}
+    for rows in fan_out(lambda using: list(period_sums(using)), branch=branch):
+        for row in rows:
+            rev, exp = totals.get(row[period_field], (Decimal('0.00'), Decimal('0.00')))
+            totals[row[period_field]] = (rev + (row['revenue'] or 0), exp + (row['expense'] or 0))
+
+    periods, revenue, expense, net = [], [], [], []
+    for period in sorted(totals):
+        rev, exp = totals[period]
+        periods.append(period)
+        revenue.append(rev)
+        expense.append(exp)
+        net.append(rev - exp)
+    return periods, revenue, expense, net
+
+
 # ---------------- Graph View using Plotly ----------------
+@reporting_reads()
 def finance_graph(request):
-    # Calculate revenue and expense totals
-    revenues = Transaction.objects.filter(transaction_type="revenue")
-    expenses = Transaction.objects.filter(transaction_type="expense")
+    form = FinanceGraphForm(request.GET or None)
+    filters = form.cleaned_data if form.is_valid() else {}
+
+    granularity = filters.get('granularity') or 'day'
+    end = filters.get('end') or timezone.localdate()
+    start = filters.get('start') or end - DEFAULT_SPAN[granularity]
 
-    revenue_sum = sum([r.total_amount for r in revenues])
-    expense_sum = sum([e.total_amount for e in expenses])
+    periods, revenue, expense, net = finance_series(
+        granularity=granularity,
+        start=start,
+        end=end,
+        branch=filters.get('branch'),
+        product_type=filters.get('product_type'),
+        product_name=filters.get('product_name'),
+    )
 
-    # Create bar chart
-    fig = go.Figure(data=[go.Bar(x=["Revenue", "Expense"], y=[revenue_sum, expense_sum], marker_color=['green','red'])])
-    fig.update_layout(title="Finance Report: Revenue vs Expense", yaxis_title="Amount (Birr)")
+    # Create chart: revenue/expense bars with net as a line
+    fig = go.Figure(data=[
+        go.Bar(x=periods, y=revenue, name="Revenue", marker_color='green'),
+        go.Bar(x=periods, y=expense, name="Expense", marker_color='red'),
+        go.Scatter(x=periods, y=net, name="Net", mode='lines+markers', line={'color': 'blue'}),
+    ])
+    fig.update_layout(
+        title=f"Finance Report: Revenue vs Expense per {granularity} ({start} to {end})",
+        yaxis_title="Amount (Birr)",
+        barmode='group',
+    )
 
     # Generate HTML div
     graph_div = pio.to_html(fig, full_html=False)
 
-    return render(request, "finance/report_graph.html", {"graph_div": graph_div})
\ No newline at end of file
+    return render(request, "finance/report_graph.html", {
+        "graph_div": graph_div,
+        "form": form,
+        "totals": {
+            "revenue": sum(revenue, Decimal('0.00')),
+            "expense": sum(expense, Decimal('0.00')),
+            "net": sum(net, Decimal('0.00')),
+        },
+    })
@@ -1,5 +1,133 @@
+"""
+Production launcher for the branches.
+
+    NOKODABO_ENV=production python start_server.py [--bind 0.0.0.0:8000] [--workers N]
+
+Runs gunicorn (pip install gunicorn): the Django app is loaded once in the
+master process and the workers are forked from it, static files are collected
+into STATIC_ROOT and served by whitenoise when it is installed. Several
+workers need a cache they all share (the production profile's file cache);
+with the per-process LocMemCache of the other profiles one worker is started
+and asking for more is refused. Control the running server through its pid
+file:
+
+    kill -HUP  $(cat server.pid)    # graceful restart: workers finish their requests first
+    kill -USR2 $(cat server.pid)    # start a new master with fresh code, then QUIT the old one
+
+Without gunicorn (e.g. on Windows) it falls back to the development server.
+"""
+import argparse
+import multiprocessing
 import os
+import sys
+
+# ---- Run from the project root ----
+project_root = os.path.dirname(os.path.abspath(__file__))
+os.chdir(project_root)
+sys.path.insert(0, project_root)
+
+# cached prices, catalog versions and branch choices are invalidated only in
+# the process that changed them, so other workers would keep stale copies
+PROCESS_LOCAL_CACHES = {"django.core.cache.backends.locmem.LocMemCache"}
+
+
+def default_workers():
+    # the usual 2 x cores + 1: sync workers spend much of their time waiting on SQLite
+    return multiprocessing.cpu_count() * 2 + 1
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Start the NokoDabo server.")
+    parser.add_argument("--bind", default="0.0.0.0:8000", help="Address and port to listen on.")
+    parser.add_argument("--workers", type=int,
+                        help="Worker processes (default 2 x cores + 1; 1 without a shared cache).")
+    parser.add_argument("--timeout", type=int, default=60, help="Seconds before a stuck worker is restarted.")
+    parser.add_argument("--pidfile", default=os.path.join(project_root, "server.pid"))
+    return parser.parse_args()
+
+
+def process_local_caches():
+    """Aliases of the CACHES that each worker process would keep to itself."""
+    from django.conf import settings
+    return [alias for alias, cache in settings.CACHES.items() if cache["BACKEND"] in PROCESS_LOCAL_CACHES]
+
+
+def build_application():
+    """The Django WSGI app with static file serving in front of it."""
+    from django.conf import settings
+    from django.core.management import call_command
+    from django.core.wsgi import get_wsgi_application
+
+    application = get_wsgi_application()
+    # refuse to start on check errors, e.g. DEBUG left on in the production profile
+    call_command("check")
+    if settings.STATIC_ROOT:
+        call_command("collectstatic", interactive=False, verbosity=0)
+    try:
+        from whitenoise import WhiteNoise
+    except ImportError:
+        # Django's own handler works too, but opens and reads each file per request
+        from django.contrib.staticfiles.handlers import StaticFilesHandler
+        return StaticFilesHandler(application)
+    return WhiteNoise(application, root=settings.STATIC_ROOT, prefix=settings.STATIC_URL, max_age=24 * 60 * 60)
+
+
+def run_gunicorn(options, application):
+    from django.db import connections
+    from gunicorn.app.base import BaseApplication
+
+    def pre_fork(server, worker):
+        # never hand a database connection opened in the master to a worker
+        connections.close_all()
+
+    class DjangoApplication(BaseApplication):
+        def load_config(self):
+            config = {
+                "bind": options.bind,
+                "workers": options.workers,
+                "timeout": options.timeout,
+                "graceful_timeout": 30,
+                "preload_app": True,
+                "pidfile": options.pidfile,
+                "accesslog": "-",
+                # recycle workers now and then, staggered so they don't all restart at once
+                "max_requests": 2000,
+                "max_requests_jitter": 200,
+                "pre_fork": pre_fork,
+            }
+            for key, value in config.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return application
+
+    DjangoApplication().run()
+
+
+def main():
+    options = parse_args()
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "NokoDabo.settings")
+
+    try:
+        import gunicorn  # noqa
+    except ImportError:
+        print("⚠️ gunicorn is not installed (pip install gunicorn); starting the development server instead.")
+        from django.core.management import execute_from_command_line
+        execute_from_command_line(["manage.py", "runserver", options.bind, "--noreload"])
+        return
+
+    application = build_application()
+    local = process_local_caches()
+    if local and options.workers is None:
+        options.workers = 1
+    elif local and options.workers > 1:
+        sys.exit(f"❌ CACHES {', '.join(local)} is private to each process, so {options.workers} workers would "
+                 f"serve stale prices; run the production profile (NOKODABO_ENV=production) or --workers 1.")
+    elif options.workers is None:
+        options.workers = default_workers()
+    print(f"🚀 Serving {os.environ['DJANGO_SETTINGS_MODULE']} on {options.bind} with {options.workers} workers")
+    run_gunicorn(options, application)
 
-# Start Django server (accessible on local network)
 
-os.system("python manage.py runserver 0.0.0.0:8000 --noreload")
+if __name__ == "__main__":
+    main()